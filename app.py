@@ -7,8 +7,16 @@ import numpy as np
 import wave
 from voice_listener import VoiceListener
 from email_sender import EmailSender
-from audio_handler import save_audio_file
+from audio_handler import save_audio_file, AttachmentTranscoder
+from notification import create_notification_sound, get_notification_sound
 from config_handler import ConfigHandler
+import events
+import metrics
+
+# Optional Prometheus metrics endpoint for local scraping, e.g. METRICS_PORT=9108
+if os.environ.get("METRICS_PORT"):
+    metrics.enable()
+    metrics.start_http_server(int(os.environ["METRICS_PORT"]))
 
 # Create necessary directories
 os.makedirs("data/audio/notification", exist_ok=True)
@@ -142,7 +150,8 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Load configuration
+# Load configuration (cached; reloaded when config files change)
+ConfigHandler.watch()
 config = ConfigHandler.get_config()
 
 # Application state
@@ -186,8 +195,8 @@ def create_beautiful_email(subject, trigger_phrase, trigger_count, has_audio=Fal
     if has_audio:
         audio_section = """
         <div class="detail audio-section">
-            <p><strong>📢 Audio Notification:</strong> A sound notification is attached to this email.</p>
-            <p>Check the email attachments to download and play the notification sound.</p>
+            <p><strong>📢 Audio:</strong> A recording of the moments around the trigger is attached to this email.</p>
+            <p>Check the email attachments to download and play it (the notification sound is attached if no recording was available).</p>
         </div>
         """
     
@@ -344,6 +353,11 @@ def main():
             notification_path = save_audio_file(notification_file, "data/audio/notification")
             st.audio(notification_file, format="audio/wav")
             st.success("Notification sound uploaded successfully!")
+        else:
+            # Without an upload, attach the synthesized default (cached, so reruns don't re-render it)
+            notification_path = create_notification_sound("data/audio/notification/default.wav")
+            st.audio(get_notification_sound(), format="audio/wav")
+            st.caption("Default notification sound")
 
         # Response sound (played locally when triggered)
         st.markdown("##### Local Response Sound")
@@ -445,7 +459,8 @@ def main():
                     "html_content": True,
                     "to_emails": st.session_state.recipients,
                     "cc_emails": st.session_state.cc_recipients,
-                    "attachment_path": notification_path  # Add the audio attachment
+                    "attachment_path": notification_path,  # Add the audio attachment
+                    "transcoder": AttachmentTranscoder()  # Compress large WAV attachments before sending
                 }
                 
                 # Set up voice listener
@@ -455,7 +470,10 @@ def main():
                     response_audio_path=response_path,
                     trigger_count=trigger_count,
                     email_config=email_config,
-                    phrase_time_limit=phrase_listen_duration
+                    phrase_time_limit=phrase_listen_duration,
+                    outbox_path="data/outbox.db",  # Deliver emails in the background, surviving restarts
+                    noise_config={"path": "data/calibration.json"},  # Track the noise floor; skip recalibrating known microphones
+                    evidence_config={"directory": "data/evidence"}  # Attach the audio around the trigger instead of the notification sound
                 )
                 st.session_state.listener = listener
         
@@ -478,38 +496,51 @@ def main():
             
             # Start the listener
             listener = st.session_state.listener
+            last_seq = listener.events.last_seq()  # Only react to events from here on
             listener.start_listening(total_duration)  # Total duration in minutes
             
             # Update progress
             start_time = time.time()
             end_time = start_time + (total_duration * 60)
             
+            def render_count(count):
+                count_text.markdown(f"""<div class="info-box">🔊 Detected: {count}/{listener.trigger_count}</div>""", unsafe_allow_html=True)
+            
+            render_count(listener.get_trigger_count())
+            shown_remaining = None
+            
             while time.time() < end_time and listener.is_running():
-                elapsed = time.time() - start_time
-                progress = min(elapsed / (total_duration * 60), 1.0)
-                
-                remaining_mins = int((total_duration * 60 - elapsed) / 60)
-                remaining_secs = int((total_duration * 60 - elapsed) % 60)
+                # Sleep until the listener reports something, waking once a second for the timer
+                new_events, last_seq = listener.events.wait(last_seq, timeout=1.0)
                 
-                progress_container.progress(progress)
-                status_text.markdown(f"""<div class="info-box">⏱️ Remaining: {remaining_mins} min {remaining_secs} sec</div>""", unsafe_allow_html=True)
-                
-                count = listener.get_trigger_count()
-                count_text.markdown(f"""<div class="info-box">🔊 Detected: {count}/{listener.trigger_count}</div>""", unsafe_allow_html=True)
+                elapsed = time.time() - start_time
+                remaining = max(int(total_duration * 60 - elapsed), 0)
+                if remaining != shown_remaining:
+                    shown_remaining = remaining
+                    progress_container.progress(min(elapsed / (total_duration * 60), 1.0))
+                    status_text.markdown(f"""<div class="info-box">⏱️ Remaining: {remaining // 60} min {remaining % 60} sec</div>""", unsafe_allow_html=True)
                 
-                # If email was sent, show success message
-                if hasattr(listener, 'email_sent') and listener.email_sent:
-                    recipients_list = ", ".join(st.session_state.recipients)
-                    st.markdown(f"""<div class="success-box">✅ <b>Email sent successfully!</b></div>""", unsafe_allow_html=True)
-                    st.markdown(f"""<div class="info-box">📧 <b>Sent to:</b> {recipients_list}</div>""", unsafe_allow_html=True)
+                for event in new_events:
+                    if event.type == events.COUNT_CHANGED:
+                        render_count(event.data["count"])
                     
-                    if st.session_state.cc_recipients:
-                        cc_list = ", ".join(st.session_state.cc_recipients)
-                        st.markdown(f"""<div class="info-box">📋 <b>CC:</b> {cc_list}</div>""", unsafe_allow_html=True)
+                    elif event.type == events.EMAIL_SENT:
+                        # If email was sent, show success message
+                        recipients_list = ", ".join(st.session_state.recipients)
+                        st.markdown(f"""<div class="success-box">✅ <b>Email sent successfully!</b></div>""", unsafe_allow_html=True)
+                        st.markdown(f"""<div class="info-box">📧 <b>Sent to:</b> {recipients_list}</div>""", unsafe_allow_html=True)
+                        
+                        if st.session_state.cc_recipients:
+                            cc_list = ", ".join(st.session_state.cc_recipients)
+                            st.markdown(f"""<div class="info-box">📋 <b>CC:</b> {cc_list}</div>""", unsafe_allow_html=True)
+                        
+                        listener.email_sent = False  # Reset flag
                     
-                    listener.email_sent = False  # Reset flag
-                
-                time.sleep(0.1)
+                    elif event.type == events.EMAIL_QUEUED:
+                        st.markdown(f"""<div class="info-box">📨 <b>Trigger threshold reached, sending email...</b></div>""", unsafe_allow_html=True)
+                    
+                    elif event.type == events.EMAIL_FAILED:
+                        st.error("Failed to send email. Check the logs for details.")
             
             # After listening completes
             if not listener.is_running():
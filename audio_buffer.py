@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+import wave
+import numpy as np
+
+
+class AudioRingBuffer:
+    """Fixed-size ring buffer holding the last `seconds` of captured PCM.
+
+    The buffer is allocated once and overwritten in place as audio arrives, so
+    memory stays constant however long the listener runs. Times are seconds of
+    audio written since the buffer was (re)configured. views() returns the
+    stored bytes of a time range as one or two NumPy views (two when the range
+    wraps around the end of the buffer), which write_wav() hands straight to
+    the WAV encoder without assembling a copy.
+    """
+
+    def __init__(self, seconds=30.0, sample_rate=16000, sample_width=2):
+        self.seconds = float(seconds)
+        self._lock = threading.Lock()
+        self._data = None
+        self.configure(sample_rate, sample_width)
+
+    def configure(self, sample_rate, sample_width):
+        """Switch to a PCM format, clearing the buffer; memory is only reallocated if its size changes"""
+        with self._lock:
+            self.sample_rate = sample_rate
+            self.sample_width = sample_width
+            capacity = int(self.seconds * sample_rate) * sample_width
+            if self._data is None or len(self._data) != capacity:
+                self._data = np.zeros(capacity, dtype=np.uint8)
+            self._written = 0  # total bytes written; the write head is _written % capacity
+
+    @property
+    def position(self):
+        """Seconds of audio written so far"""
+        return self._written / float(self.sample_rate * self.sample_width)
+
+    def write(self, data):
+        capacity = len(self._data)
+        incoming = np.frombuffer(data, dtype=np.uint8)
+        with self._lock:
+            if len(incoming) >= capacity:
+                # Only the tail fits; keep the write head where a full write would leave it
+                self._written += len(incoming) - capacity
+                incoming = incoming[-capacity:]
+            head = self._written % capacity
+            first = min(len(incoming), capacity - head)
+            self._data[head:head + first] = incoming[:first]
+            self._data[:len(incoming) - first] = incoming[first:]
+            self._written += len(incoming)
+
+    def views(self, start, end):
+        """Return (views, start, end) for the stored audio between two buffer times.
+
+        The range is clipped to what the buffer still holds; start and end are
+        the clipped times. The views alias the buffer, so they are only valid
+        until the capture overwrites that region.
+        """
+        bytes_per_second = self.sample_rate * self.sample_width
+        with self._lock:
+            capacity = len(self._data)
+            oldest = max(0, self._written - capacity)
+            first = min(max(int(start * bytes_per_second), oldest), self._written)
+            last = min(max(int(end * bytes_per_second), first), self._written)
+            first -= first % self.sample_width
+            last -= last % self.sample_width
+        if first == last:
+            return [], first / bytes_per_second, last / bytes_per_second
+
+        begin, stop = first % capacity, last % capacity
+        if begin < stop or stop == 0:
+            views = [self._data[begin:stop or capacity]]
+        else:
+            views = [self._data[begin:], self._data[:stop]]
+        return views, first / bytes_per_second, last / bytes_per_second
+
+    def write_wav(self, path, start, end):
+        """Encode the audio between two buffer times as a mono WAV file; returns its duration"""
+        views, start, end = self.views(start, end)
+        with wave.open(path, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(self.sample_width)
+            wav.setframerate(self.sample_rate)
+            for view in views:
+                wav.writeframes(view)
+        return end - start
+
+
+class RecordingStream:
+    """Wraps an audio source's stream so every chunk read is also copied into an AudioRingBuffer"""
+
+    def __init__(self, stream, buffer):
+        self.stream = stream
+        self.buffer = buffer
+
+    def read(self, size):
+        data = self.stream.read(size)
+        if data:
+            self.buffer.write(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class EvidenceRecorder:
+    """Keeps recent audio and saves the stretch around a detection as a WAV file.
+
+    Clips cover `before` seconds before the end of the detection and up to
+    `after` seconds past it, as far as that audio has been captured when the
+    clip is saved. Only the newest `max_files` clips are kept in `directory`,
+    plus any that in_use() (e.g. EmailOutbox.pending_attachments) still lists.
+    """
+
+    def __init__(self, directory="data/evidence", seconds=30.0, before=8.0, after=2.0, max_files=50,
+                 in_use=None):
+        if before + after > seconds:
+            raise ValueError("The evidence buffer must hold at least before + after seconds")
+        self.directory = directory
+        self.in_use = in_use
+        self.before = before
+        self.after = after
+        self.max_files = max_files
+        self.buffer = AudioRingBuffer(seconds)
+        self.saved = 0
+
+    def attach(self, source):
+        """Record the entered source's reads into the buffer"""
+        if isinstance(source.stream, RecordingStream) or source.stream is None:
+            return
+        if (source.SAMPLE_RATE, source.SAMPLE_WIDTH) != (self.buffer.sample_rate, self.buffer.sample_width):
+            self.buffer.configure(source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+        source.stream = RecordingStream(source.stream, self.buffer)
+
+    @property
+    def position(self):
+        return self.buffer.position
+
+    def save(self, detected_at=None, name="evidence"):
+        """Write the clip around a detection (buffer time, default now); returns its path or None"""
+        detected_at = self.buffer.position if detected_at is None else detected_at
+        os.makedirs(self.directory, exist_ok=True)
+        now = time.time()
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1000) % 1000:03d}"
+        path = os.path.join(self.directory, f"{name}-{stamp}.wav")
+        duration = self.buffer.write_wav(path, detected_at - self.before, detected_at + self.after)
+        if duration <= 0:
+            os.remove(path)
+            return None
+        self.saved += 1
+        self._prune()
+        return path
+
+    def _prune(self):
+        files = [os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith(".wav")]
+        if len(files) <= self.max_files:
+            return
+        files.sort(key=os.path.getmtime)
+        keep = set()
+        if self.in_use:
+            try:
+                keep = {os.path.abspath(path) for path in self.in_use()}
+            except Exception as e:
+                print(f"Error listing evidence clips in use, keeping all: {e}")
+                return
+        for path in files[:len(files) - self.max_files]:
+            if os.path.abspath(path) in keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -1,30 +1,91 @@
 import os
 import tempfile
 import uuid
+import json
+import hashlib
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from pydub import AudioSegment
 
-def save_audio_file(uploaded_file, directory="data/audio"):
-    """Save an uploaded audio file to the specified directory"""
+_store_lock = threading.Lock()
+
+def save_audio_file(uploaded_file, directory="data/audio", chunk_size=1024 * 1024):
+    """Save an uploaded audio file into a content-addressed store under directory.
+
+    The upload is hashed while it is copied in chunks and stored once as
+    <directory>/<sha256>/<original name>. Saving identical content again (e.g. on
+    every Streamlit rerun) returns the existing path instead of writing a copy.
+    """
     os.makedirs(directory, exist_ok=True)
     
-    # Generate a unique filename if none provided
-    if not uploaded_file.name:
-        file_extension = ".wav"
-        filename = f"{uuid.uuid4()}{file_extension}"
-    else:
-        # Make sure filename is unique
-        base, ext = os.path.splitext(uploaded_file.name)
-        filename = f"{base}_{uuid.uuid4()}{ext}"
+    # Use a generated name if none provided
+    name = os.path.basename(uploaded_file.name) if uploaded_file.name else f"{uuid.uuid4()}.wav"
     
-    # Full path to save the file
-    file_path = os.path.join(directory, filename)
-    
-    # Save the file
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
+    # Copy into a temporary file, hashing as we go
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(suffix=".part", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            uploaded_file.seek(0)
+            for chunk in iter(lambda: uploaded_file.read(chunk_size), b""):
+                digest.update(chunk)
+                f.write(chunk)
+            uploaded_file.seek(0)
+        
+        digest = digest.hexdigest()
+        with _store_lock:
+            index = _load_store_index(directory)
+            entry = index.get(digest)
+            existing = os.path.join(directory, entry["path"]) if entry else None
+            
+            if existing and os.path.exists(existing):
+                file_path = existing
+            else:
+                # Full path to save the file
+                relative_path = os.path.join(digest, name)
+                file_path = os.path.join(directory, relative_path)
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                os.replace(tmp_path, file_path)
+                entry = {"path": relative_path, "names": []}
+                index[digest] = entry
+            
+            if name not in entry["names"] or file_path != existing:
+                if name not in entry["names"]:
+                    entry["names"].append(name)
+                _save_store_index(directory, index)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
     
     return file_path
 
+def find_audio_files(name, directory="data/audio"):
+    """Return stored paths whose content was uploaded under the given original name"""
+    with _store_lock:
+        index = _load_store_index(directory)
+    return [os.path.join(directory, entry["path"]) for entry in index.values()
+            if name in entry["names"]]
+
+def _load_store_index(directory):
+    index_path = os.path.join(directory, "index.json")
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading audio index: {e}")
+    return {}
+
+def _save_store_index(directory, index):
+    index_path = os.path.join(directory, "index.json")
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+
 def convert_audio_to_wav(file_path):
     """Convert various audio formats to WAV format"""
     try:
@@ -52,4 +113,340 @@ def convert_audio_to_wav(file_path):
         return output_path
     except Exception as e:
         print(f"Error converting audio: {e}")
-        return file_path
\ No newline at end of file
+        return file_path
+
+# Target parameters for sounds that will be played back locally
+PLAYBACK_FORMAT = {"sample_rate": 44100, "channels": 1, "sample_width": 2}
+
+_digest_memo = OrderedDict()  # (path, mtime, size) -> content digest, least recently used first
+_digest_memo_lock = threading.Lock()
+DIGEST_MEMO_SIZE = 1024
+
+def _memo_get(memo, key):
+    with _digest_memo_lock:
+        digest = memo.get(key)
+        if digest is not None:
+            memo.move_to_end(key)
+        return digest
+
+def _memo_put(memo, key, digest, max_size=DIGEST_MEMO_SIZE):
+    with _digest_memo_lock:
+        memo[key] = digest
+        memo.move_to_end(key)
+        while len(memo) > max_size:
+            memo.popitem(last=False)
+
+def converted_path(digest, cache_dir, sample_rate=None, channels=None, sample_width=None):
+    """Cache location for a source digest converted with the given target parameters"""
+    params = f"{sample_rate or 'src'}-{channels or 'src'}-{sample_width or 'src'}"
+    return os.path.join(cache_dir, f"{digest}_{params}.wav")
+
+def convert_audio_cached(file_path, cache_dir="data/audio/converted", sample_rate=None,
+                         channels=None, sample_width=None, digest=None):
+    """Convert a file to WAV once, caching the result by content hash and target parameters.
+
+    Parameters left as None keep the source value. Returns the cached WAV path,
+    or file_path itself if the conversion fails.
+    """
+    try:
+        digest = digest or file_digest(file_path)
+        output_path = converted_path(digest, cache_dir, sample_rate, channels, sample_width)
+        if os.path.exists(output_path):
+            return output_path
+        
+        os.makedirs(cache_dir, exist_ok=True)
+        _, ext = os.path.splitext(file_path)
+        audio = AudioSegment.from_file(file_path, format=ext.lower().lstrip(".") or None)
+        if sample_rate:
+            audio = audio.set_frame_rate(sample_rate)
+        if channels:
+            audio = audio.set_channels(channels)
+        if sample_width:
+            audio = audio.set_sample_width(sample_width)
+        
+        # Write under a temporary name so concurrent or interrupted runs never expose partial files
+        fd, tmp_path = tempfile.mkstemp(suffix=".wav", dir=cache_dir)
+        os.close(fd)
+        try:
+            audio.export(tmp_path, format="wav")
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return output_path
+    except Exception as e:
+        print(f"Error converting audio: {e}")
+        return file_path
+
+def _convert_job(args):
+    file_path, kwargs = args
+    return file_path, convert_audio_cached(file_path, **kwargs)
+
+def convert_audio_batch(file_paths, cache_dir="data/audio/converted", sample_rate=None,
+                        channels=None, sample_width=None, playback_ready=False, max_workers=None):
+    """Convert many audio files to WAV in parallel on a process pool.
+
+    Each result is cached on disk by content hash plus target parameters, so
+    files that were already converted (in this or an earlier run) are skipped.
+    With playback_ready=True outputs are normalized to PLAYBACK_FORMAT.
+    Returns a dict mapping each input path to its WAV path.
+    """
+    if playback_ready:
+        sample_rate = sample_rate or PLAYBACK_FORMAT["sample_rate"]
+        channels = channels or PLAYBACK_FORMAT["channels"]
+        sample_width = sample_width or PLAYBACK_FORMAT["sample_width"]
+    
+    results = {}
+    jobs = []
+    for file_path in dict.fromkeys(file_paths):
+        if not os.path.exists(file_path):
+            print(f"Audio file not found: {file_path}")
+            results[file_path] = file_path
+            continue
+        
+        # Skip the pool entirely for files we already know are converted
+        stat = os.stat(file_path)
+        digest = _memo_get(_digest_memo, (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size))
+        if digest:
+            output_path = converted_path(digest, cache_dir, sample_rate, channels, sample_width)
+            if os.path.exists(output_path):
+                results[file_path] = output_path
+                continue
+        
+        kwargs = {"cache_dir": cache_dir, "sample_rate": sample_rate, "channels": channels,
+                  "sample_width": sample_width, "digest": digest}
+        jobs.append((file_path, kwargs))
+    
+    if len(jobs) == 1 or max_workers == 1:
+        outputs = map(_convert_job, jobs)
+    elif jobs:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            outputs = list(executor.map(_convert_job, jobs))
+    else:
+        outputs = []
+    
+    for file_path, output_path in outputs:
+        results[file_path] = output_path
+        if output_path != file_path:
+            # The digest is the first part of the cached file name
+            stat = os.stat(file_path)
+            digest = os.path.basename(output_path).split("_", 1)[0]
+            _memo_put(_digest_memo, (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size), digest)
+    
+    return results
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    """SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class AttachmentTranscoder:
+    """Transcode large audio attachments to a compressed format before emailing.
+
+    Files at or below size_threshold bytes are sent untouched. Larger files are
+    converted once (mono, reduced sample rate, compressed codec) and the result is
+    cached under cache_dir by content hash, so each distinct file is only ever
+    transcoded once, including across restarts.
+
+    The cache is bounded: entries unused for max_age seconds are dropped, then
+    the least recently used ones until the cached files total at most max_bytes
+    and the index holds at most max_entries. Evidence clips are unique per
+    trigger, so without this the cache would grow with every detection.
+    """
+
+    FORMATS = {
+        "mp3": ("mp3", ".mp3", []),  # constant bitrate, set by the bitrate argument
+        "opus": ("opus", ".opus", ["-application", "voip"]),
+        "ogg": ("ogg", ".ogg", []),
+        "wav": ("wav", ".wav", None),  # low-rate mono PCM, no ffmpeg needed
+    }
+
+    def __init__(self, cache_dir="data/audio/transcoded", size_threshold=256 * 1024,
+                 format="mp3", bitrate="64k", sample_rate=22050, channels=1,
+                 max_bytes=64 * 1024 * 1024, max_entries=1024, max_age=7 * 24 * 3600):
+        if format not in self.FORMATS:
+            raise ValueError(f"Unsupported attachment format: {format}")
+
+        self.cache_dir = cache_dir
+        self.size_threshold = size_threshold
+        self.format = format
+        self.bitrate = bitrate
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self._digests = OrderedDict()  # (path, mtime, size) -> content digest, least recently used first
+        self._failed = set()  # cache keys that could not be transcoded in this process
+        self._index_path = os.path.join(cache_dir, "index.json")
+        self._index = self._load_index()  # cache key -> entry, least recently used first
+        with self._lock:
+            if self._prune():
+                self._save_index()
+
+    def transcode(self, file_path):
+        """Return the path to attach: a cached transcoded copy, or file_path itself"""
+        if not file_path or not os.path.exists(file_path):
+            return file_path
+
+        stat = os.stat(file_path)
+        if stat.st_size <= self.size_threshold:
+            return file_path
+
+        try:
+            key = self._cache_key(file_path, stat)
+            with self._lock:
+                entry = self._index.get(key)
+                if entry:
+                    # Recency is saved with the index on the next change
+                    entry["used"] = time.time()
+                    self._index.move_to_end(key)
+            if key in self._failed:
+                return file_path
+            if entry:
+                cached_path = os.path.join(self.cache_dir, entry["file"]) if entry["file"] else None
+                if cached_path is None:
+                    return file_path  # transcoding did not shrink this file last time
+                if os.path.exists(cached_path):
+                    return cached_path
+
+        except Exception as e:
+            print(f"Error transcoding attachment: {e}")
+            return file_path
+
+        try:
+            return self._transcode(file_path, key, stat.st_size)
+        except Exception as e:
+            # Usually a missing ffmpeg; don't retry this file on every send
+            print(f"Error transcoding attachment: {e}")
+            self._failed.add(key)
+            return file_path
+
+    def get_stats(self):
+        """Cache size and the bytes saved by sending transcoded copies"""
+        with self._lock:
+            entries = list(self._index.values())
+        transcoded = [entry for entry in entries if entry["file"]]
+        return {
+            "cached_files": len(transcoded),
+            "source_bytes": sum(entry["source_size"] for entry in transcoded),
+            "output_bytes": sum(entry["output_size"] for entry in transcoded),
+            "bytes_saved": sum(entry["source_size"] - entry["output_size"] for entry in transcoded),
+        }
+
+    def _cache_key(self, file_path, stat):
+        # Hashing is only redone when the file on disk changes
+        file_key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+        digest = _memo_get(self._digests, file_key)
+        if digest is None:
+            digest = file_digest(file_path)
+            _memo_put(self._digests, file_key, digest)
+        params = f"{self.format}-{self.bitrate}-{self.sample_rate}-{self.channels}"
+        return f"{digest}-{params}"
+
+    def _transcode(self, file_path, key, source_size):
+        export_format, ext, parameters = self.FORMATS[self.format]
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # pydub reads WAV natively; other formats go through ffmpeg
+        _, source_ext = os.path.splitext(file_path)
+        audio = AudioSegment.from_file(file_path, format=source_ext.lower().lstrip(".") or None)
+        audio = audio.set_channels(self.channels).set_frame_rate(self.sample_rate)
+        if self.format == "wav":
+            audio = audio.set_sample_width(2)
+
+        # Export to a temporary name first so a crash never leaves a partial cache entry
+        # Keep the original file name so recipients see something meaningful
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        filename = os.path.join(hashlib.sha256(key.encode("utf-8")).hexdigest()[:32], stem + ext)
+        output_path = os.path.join(self.cache_dir, filename)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=ext, dir=self.cache_dir)
+        os.close(fd)
+        try:
+            kwargs = {"format": export_format, "parameters": parameters}
+            if self.format != "wav":
+                kwargs["bitrate"] = self.bitrate
+            audio.export(tmp_path, **kwargs)
+            output_size = os.path.getsize(tmp_path)
+
+            if output_size >= source_size:
+                os.remove(tmp_path)
+                entry = {"file": None, "source_size": source_size, "output_size": source_size,
+                         "used": time.time()}
+                result = file_path
+            else:
+                os.replace(tmp_path, output_path)
+                entry = {"file": filename, "source_size": source_size, "output_size": output_size,
+                         "used": time.time()}
+                result = output_path
+                print(f"Transcoded attachment {os.path.basename(file_path)}: {source_size} -> {output_size} bytes")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        with self._lock:
+            self._index[key] = entry
+            self._index.move_to_end(key)
+            self._prune(keep=key)
+            self._save_index()
+        return result
+
+    def _prune(self, keep=None):
+        """Evict expired and least recently used entries other than keep (lock held).
+
+        Returns whether anything was evicted.
+        """
+        cutoff = time.time() - self.max_age
+        total = sum(entry["output_size"] for entry in self._index.values() if entry["file"])
+        evicted = False
+        for key in list(self._index):
+            entry = self._index[key]
+            if (entry["used"] >= cutoff and total <= self.max_bytes
+                    and len(self._index) <= self.max_entries):
+                break
+            if key == keep:
+                continue
+            del self._index[key]
+            evicted = True
+            if entry["file"]:
+                total -= entry["output_size"]
+                self._remove_file(entry["file"])
+        return evicted
+
+    def _remove_file(self, filename):
+        # Each cached file sits alone in a directory named after its cache key
+        path = os.path.join(self.cache_dir, filename)
+        try:
+            if os.path.dirname(filename):
+                shutil.rmtree(os.path.dirname(path))
+            else:
+                os.remove(path)
+        except OSError as e:
+            print(f"Error removing transcoded attachment {path}: {e}")
+
+    def _load_index(self):
+        if os.path.exists(self._index_path):
+            try:
+                with open(self._index_path, "r") as f:
+                    entries = json.load(f)
+                # Oldest use first; entries written before recency was tracked count as new
+                now = time.time()
+                for entry in entries.values():
+                    entry.setdefault("used", now)
+                return OrderedDict(sorted(entries.items(), key=lambda item: item[1]["used"]))
+            except Exception as e:
+                print(f"Error loading transcode index: {e}")
+        return OrderedDict()
+
+    def _save_index(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path)
@@ -0,0 +1,216 @@
+import os
+import stat
+import sys
+import numpy as np
+import speech_recognition as sr
+
+# Formats sr.AudioFile can decode (FLAC through the converter bundled with SpeechRecognition)
+AUDIO_EXTENSIONS = (".wav", ".flac", ".aif", ".aiff")
+
+
+class _SourceStream:
+    """Stream handed to Recognizer.listen; counts frames and notices the end of input"""
+
+    def __init__(self, source):
+        self.source = source
+
+    def read(self, size):
+        data = self.source._read(size)
+        if data:
+            self.source.frames_read += len(data) // self.source.SAMPLE_WIDTH
+        return data
+
+
+class StreamSource(sr.AudioSource):
+    """Base class for headless audio sources (files, directories, pipes).
+
+    VoiceListener enters its source once per listen() call. sr.AudioFile would
+    reopen the file and start over each time, so these sources keep their read
+    position across `with` blocks and set `exhausted` once the input is used up.
+    close() releases the underlying file or pipe.
+    """
+
+    SAMPLE_RATE = 16000
+    SAMPLE_WIDTH = 2
+    CHUNK = 1024
+
+    def __init__(self):
+        self.stream = None
+        self.exhausted = False
+        self.frames_read = 0
+
+    def __enter__(self):
+        self.stream = _SourceStream(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stream = None
+
+    @property
+    def position(self):
+        """Seconds of audio read so far"""
+        return self.frames_read / float(self.SAMPLE_RATE)
+
+    def close(self):
+        pass
+
+    def _read(self, size):
+        raise NotImplementedError
+
+
+class FileSource(StreamSource):
+    """A single WAV, AIFF or FLAC recording"""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._file = sr.AudioFile(path)
+        self._file.__enter__()
+        self.SAMPLE_RATE = self._file.SAMPLE_RATE
+        self.SAMPLE_WIDTH = self._file.SAMPLE_WIDTH
+        self.CHUNK = self._file.CHUNK
+        self.duration = self._file.DURATION
+
+    def _read(self, size):
+        if self.exhausted:
+            return b""
+        data = self._file.stream.read(size)
+        if not data:
+            self.exhausted = True
+        return data
+
+    def close(self):
+        if self._file.stream is not None:
+            self._file.__exit__(None, None, None)
+        self.exhausted = True
+
+
+class DirectorySource(StreamSource):
+    """Every recording in a directory, played in name order.
+
+    The end of each file ends the current phrase, so clips never span two
+    recordings. The next file is opened when the listener enters the source
+    again, which keeps sample rates consistent within a clip. `path` names the
+    recording currently being read.
+    """
+
+    def __init__(self, directory, recursive=False):
+        super().__init__()
+        self.paths = find_recordings(directory, recursive)
+        self._index = -1
+        self._current = None
+        self.path = None
+        self._advance()
+
+    def __enter__(self):
+        if self._current is not None and self._current.exhausted:
+            self._advance()
+        return super().__enter__()
+
+    def _advance(self):
+        if self._current is not None:
+            self._current.close()
+        self._current = None
+        while self._index + 1 < len(self.paths):
+            self._index += 1
+            try:
+                self._current = FileSource(self.paths[self._index])
+            except Exception as e:
+                print(f"Skipping {self.paths[self._index]}: {e}")
+                continue
+            self.path = self._current.path
+            self.SAMPLE_RATE = self._current.SAMPLE_RATE
+            self.SAMPLE_WIDTH = self._current.SAMPLE_WIDTH
+            self.CHUNK = self._current.CHUNK
+            self.frames_read = 0
+            print(f"Reading {self.path}")
+            return
+        self.exhausted = True
+
+    def _read(self, size):
+        if self._current is None:
+            return b""
+        data = self._current._read(size)
+        if not data and self._index + 1 >= len(self.paths):
+            self.exhausted = True
+        return data
+
+    def close(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+        self.exhausted = True
+
+
+class RawPCMSource(StreamSource):
+    """Signed little-endian PCM read from a binary stream, stdin by default.
+
+    Suitable for pipes such as `arecord -f S16_LE -r 16000 -c 1 | ...` or
+    `ffmpeg -i input -f s16le -ac 1 -ar 16000 - | ...`. Multi-channel input is
+    mixed down to mono.
+    """
+
+    def __init__(self, stream=None, sample_rate=16000, sample_width=2, channels=1, chunk=1024):
+        super().__init__()
+        if sample_width not in (1, 2, 4):
+            raise ValueError(f"Unsupported sample width: {sample_width}")
+        self.input = stream if stream is not None else sys.stdin.buffer
+        self.SAMPLE_RATE = sample_rate
+        self.SAMPLE_WIDTH = sample_width
+        self.CHUNK = chunk
+        self.channels = channels
+
+    def _read(self, size):
+        if self.exhausted:
+            return b""
+        frame_bytes = self.SAMPLE_WIDTH * self.channels
+        data = self.input.read(size * frame_bytes)
+        if not data:
+            self.exhausted = True
+            return b""
+
+        # Pipes may return short reads; keep whole frames only
+        while len(data) % frame_bytes:
+            more = self.input.read(frame_bytes - len(data) % frame_bytes)
+            if not more:
+                data = data[:len(data) - len(data) % frame_bytes]
+                break
+            data += more
+
+        if self.channels > 1:
+            dtype = {1: np.int8, 2: '<i2', 4: '<i4'}[self.SAMPLE_WIDTH]
+            samples = np.frombuffer(data, dtype=dtype).reshape(-1, self.channels)
+            data = samples.mean(axis=1).astype(dtype).tobytes()
+        return data
+
+    def close(self):
+        if self.input is not sys.stdin.buffer:
+            self.input.close()
+        self.exhausted = True
+
+
+def find_recordings(directory, recursive=False):
+    """Sorted paths of the decodable recordings in directory"""
+    paths = []
+    if recursive:
+        for root, _, names in os.walk(directory):
+            paths.extend(os.path.join(root, name) for name in names)
+    else:
+        paths = [os.path.join(directory, name) for name in os.listdir(directory)]
+    return sorted(p for p in paths if os.path.isfile(p) and p.lower().endswith(AUDIO_EXTENSIONS))
+
+
+def open_source(spec, **kwargs):
+    """Open an audio source from a command-line style spec.
+
+    "-" reads raw PCM from stdin and a named pipe reads raw PCM from the pipe
+    (kwargs are passed to RawPCMSource), a directory replays every recording
+    in it, and anything else is opened as a single audio file.
+    """
+    if spec == "-":
+        return RawPCMSource(**kwargs)
+    if stat.S_ISFIFO(os.stat(spec).st_mode):
+        return RawPCMSource(open(spec, "rb"), **kwargs)
+    if os.path.isdir(spec):
+        return DirectorySource(spec)
+    return FileSource(spec)
@@ -0,0 +1,639 @@
+"""Offline replay benchmark for the listening pipeline.
+
+Replays a corpus of WAV recordings through VoiceListener in place of the
+microphone, swaps Google recognition for a deterministic stub with configurable
+latency and delivers emails to a local SMTP stand-in, so throughput and latency
+can be measured without audio hardware or network access:
+
+    python benchmark.py recordings/ --latency 0.2 --workers 2
+    python benchmark.py --synthetic 40 --max-detection-p95 1.0
+    python benchmark.py --fuzzy 3000 --max-fuzzy-p95 0.005
+
+Each recording `name.wav` may have a `name.txt` transcript next to it; the stub
+recognizer returns that transcript for the clip covering the middle of the
+recording. Recordings without a transcript are treated as unintelligible.
+"""
+import argparse
+import bisect
+import contextlib
+import io
+import json
+import os
+import random
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import wave
+import numpy as np
+import speech_recognition as sr
+import events
+from playback import load_wav_samples
+from fuzzy_matcher import FuzzyPhraseMatcher
+from smtp_pool import SMTPConnectionPool
+from voice_listener import VoiceListener
+
+
+class ReplayTranscript(str):
+    """Transcript returned by the stub recognizer, tagged with the recording it came from"""
+
+    def __new__(cls, text, segment):
+        transcript = super().__new__(cls, text)
+        transcript.segment = segment
+        return transcript
+
+
+class _ReplayStream:
+    def __init__(self, source):
+        self.source = source
+
+    def read(self, size):
+        return self.source._read(size)
+
+
+class ReplaySource(sr.AudioSource):
+    """Audio source that plays recordings back to back, separated by silence.
+
+    Unlike sr.AudioFile, the read position survives repeated `with` blocks, so
+    VoiceListener's loop walks through the whole corpus once. Recordings are
+    mixed down to mono 16-bit PCM at sample_rate. With realtime=True reads are
+    paced like a live microphone; otherwise the corpus is replayed as fast as
+    the listener can consume it. Once exhausted, reads block until close().
+    """
+
+    def __init__(self, recordings, sample_rate=16000, chunk=1024, gap=1.2, lead_in=1.0, realtime=False):
+        self.SAMPLE_RATE = sample_rate
+        self.SAMPLE_WIDTH = 2
+        self.CHUNK = chunk
+        self.realtime = realtime
+        self.stream = None
+
+        # recordings: iterable of (path, transcript or None)
+        self.paths = []
+        self.transcripts = []
+        parts = [np.zeros(int(lead_in * sample_rate), dtype=np.int16)]
+        silence = np.zeros(int(gap * sample_rate), dtype=np.int16)
+        self.starts = []  # byte offsets of each recording in the replay buffer
+        self.ends = []
+        offset = parts[0].nbytes
+        for path, transcript in recordings:
+            samples = _to_mono(path, sample_rate)
+            self.paths.append(path)
+            self.transcripts.append(transcript)
+            self.starts.append(offset)
+            self.ends.append(offset + samples.nbytes)
+            parts.extend((samples, silence))
+            offset += samples.nbytes + silence.nbytes
+        self.pcm = np.concatenate(parts).tobytes()
+
+        # Each read returns whole chunks from a chunk-aligned offset, so any clip
+        # can be located by looking up one of its chunks
+        chunk_bytes = chunk * self.SAMPLE_WIDTH
+        self._chunk_offsets = {}
+        for start in range(0, len(self.pcm), chunk_bytes):
+            key = hash(self.pcm[start:start + chunk_bytes])
+            # Repeated chunks (e.g. silence) cannot identify a position
+            self._chunk_offsets[key] = None if key in self._chunk_offsets else start
+
+        self.offset = 0  # bytes read so far
+        self.ended_at = [None] * len(self.paths)  # wall time each recording finished playing
+        self.started_at = None
+        self._next_end = 0
+        self._claimed = set()
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+    def __enter__(self):
+        self.stream = _ReplayStream(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stream = None
+
+    @property
+    def exhausted(self):
+        return self.offset >= len(self.pcm)
+
+    @property
+    def duration(self):
+        return len(self.pcm) / (self.SAMPLE_RATE * self.SAMPLE_WIDTH)
+
+    def close(self):
+        self._closed.set()
+
+    def _read(self, size):
+        if self.exhausted:
+            self._closed.wait()
+            return b""
+
+        now = time.time()
+        if self.started_at is None:
+            self.started_at = now
+        end = min(self.offset + size * self.SAMPLE_WIDTH, len(self.pcm))
+        if self.realtime:
+            due = self.started_at + end / (self.SAMPLE_RATE * self.SAMPLE_WIDTH)
+            if due > now:
+                time.sleep(due - now)
+                now = due
+
+        data = self.pcm[self.offset:end]
+        self.offset = end
+        while self._next_end < len(self.ends) and self.ends[self._next_end] <= end:
+            self.ended_at[self._next_end] = now
+            self._next_end += 1
+        return data
+
+    def claim(self, frame_data):
+        """Return the index of the recording whose midpoint lies in this clip.
+
+        Each recording is claimed at most once, so a recording split across
+        several clips is only recognized once. Returns None if no unclaimed
+        recording matches.
+        """
+        chunk_bytes = self.CHUNK * self.SAMPLE_WIDTH
+        start = None
+        for i in range(0, len(frame_data), chunk_bytes):
+            offset = self._chunk_offsets.get(hash(frame_data[i:i + chunk_bytes]))
+            if offset is not None:
+                start = offset - i
+                break
+        if start is None:
+            return None
+
+        end = start + len(frame_data)
+        index = bisect.bisect_right(self.starts, end) - 1
+        while index >= 0 and self.ends[index] > start:
+            middle = (self.starts[index] + self.ends[index]) // 2
+            if start <= middle < end:
+                with self._lock:
+                    if index in self._claimed:
+                        return None
+                    self._claimed.add(index)
+                return index
+            index -= 1
+        return None
+
+
+class StubRecognizer:
+    """Deterministic stand-in for Recognizer.recognize_google.
+
+    Sleeps for latency plus up to `jitter` seconds (seeded), then returns the
+    transcript of the replayed recording the clip belongs to, or raises
+    UnknownValueError like the real recognizer does for unintelligible audio.
+    """
+
+    def __init__(self, source, latency=0.1, jitter=0.0, seed=0):
+        self.source = source
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.clips = 0
+        self.recognized = 0
+
+    def __call__(self, audio_data, *args, **kwargs):
+        if not audio_data.frame_data:
+            raise sr.UnknownValueError()
+
+        with self._lock:
+            self.clips += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        index = self.source.claim(audio_data.frame_data)
+        if index is None or not self.source.transcripts[index]:
+            raise sr.UnknownValueError()
+        with self._lock:
+            self.recognized += 1
+        return ReplayTranscript(self.source.transcripts[index], index)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        self.reply("220 localhost benchmark SMTP ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("ascii", "replace").strip().upper()
+
+            if command.startswith("EHLO"):
+                self.wfile.write(b"250-localhost\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+            elif command.startswith("AUTH"):
+                self.reply("235 Authentication successful")
+            elif command.startswith("DATA"):
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line == b".\r\n":
+                        break
+                    size += len(data_line)
+                if server.delay:
+                    time.sleep(server.delay)
+                server.record(size)
+                self.reply("250 OK queued")
+            elif command.startswith("QUIT"):
+                self.reply("221 Bye")
+                return
+            elif command.startswith(("HELO", "MAIL", "RCPT", "RSET", "NOOP")):
+                self.reply("250 OK")
+            else:
+                self.reply("502 Command not implemented")
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """Minimal plaintext SMTP sink on localhost that records when each message arrives.
+
+    Accepts any login; `delay` adds a fixed server-side latency after DATA.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, delay=0.0):
+        super().__init__((host, port), _SMTPHandler)
+        self.delay = delay
+        self.received = []  # (timestamp, size)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def record(self, size):
+        with self._lock:
+            self.received.append((time.time(), size))
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="benchmark-smtp")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def _to_mono(path, sample_rate):
+    samples, rate = load_wav_samples(path)
+    mono = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0].astype(np.float64)
+    if rate != sample_rate and len(mono):
+        positions = np.arange(int(len(mono) * sample_rate / rate)) * (rate / sample_rate)
+        mono = np.interp(positions, np.arange(len(mono)), mono)
+    return np.clip(mono, -32768, 32767).astype(np.int16)
+
+
+def load_corpus(directory):
+    """Return [(wav_path, transcript or None)] for every WAV file in directory, sorted by name"""
+    recordings = []
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(".wav"):
+            continue
+        path = os.path.join(directory, name)
+        transcript_path = os.path.splitext(path)[0] + ".txt"
+        transcript = None
+        if os.path.exists(transcript_path):
+            with open(transcript_path, encoding="utf-8") as f:
+                transcript = f.read().strip() or None
+        recordings.append((path, transcript))
+    return recordings
+
+
+def make_synthetic_corpus(directory, clips=24, trigger_phrase="send email", trigger_ratio=0.5,
+                          sample_rate=16000, seed=0):
+    """Write speech-like noise bursts with transcripts, a fraction of which contain the trigger phrase"""
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    fillers = ["the weather is nice today", "remind me about lunch", "turn up the volume",
+               "what time is it"]
+    for i in range(clips):
+        duration = rng.uniform(0.6, 1.6)
+        count = int(duration * sample_rate)
+        t = np.arange(count) / sample_rate
+        # Noise shaped by a syllable-rate envelope, loud enough to pass the energy threshold
+        envelope = 0.55 + 0.45 * np.sin(2 * np.pi * rng.uniform(3, 6) * t)
+        samples = (rng.normal(0, 4000, count) * envelope).clip(-32768, 32767).astype('<i2')
+
+        path = os.path.join(directory, f"clip_{i:04d}.wav")
+        with wave.open(path, 'wb') as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(sample_rate)
+            wf.writeframes(samples.tobytes())
+
+        if rng.random() < trigger_ratio:
+            text = f"please {trigger_phrase} now"
+        else:
+            text = fillers[i % len(fillers)]
+        with open(os.path.splitext(path)[0] + ".txt", "w", encoding="utf-8") as f:
+            f.write(text)
+    return directory
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values (None if empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(np.ceil(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def _summarize(values):
+    return {
+        "count": len(values),
+        "avg": sum(values) / len(values) if values else None,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+    }
+
+
+def run_benchmark(recordings, trigger_phrases=None, trigger_count=1, latency=0.1, jitter=0.0,
+                  seed=0, workers=0, queue_size=4, drop_policy="block", realtime=False,
+                  smtp_delay=0.0, outbox=False, vad_config=None, fuzzy_config=None,
+                  streaming_config=None, chunk=1024, gap=1.2, drain_timeout=30, verbose=False):
+    """Replay recordings through a VoiceListener and return throughput and latency figures.
+
+    Detection latency runs from the moment a recording finishes playing to its
+    trigger event; trigger-to-email latency from the detection that reaches the
+    threshold to the stand-in server accepting the message.
+    """
+    source = ReplaySource(recordings, chunk=chunk, gap=gap, realtime=realtime)
+    stub = StubRecognizer(source, latency=latency, jitter=jitter, seed=seed)
+    smtp_server = LocalSMTPServer(delay=smtp_delay).start()
+    workdir = tempfile.mkdtemp(prefix="voice-bench-")
+
+    email_config = {
+        "sender": "bench@localhost",
+        "password": "benchmark",
+        "server": "Custom",
+        "smtp_server": "127.0.0.1",
+        "smtp_port": smtp_server.port,
+        "to_emails": ["sink@localhost"],
+        "subject": "Benchmark trigger",
+        "body": "Triggered by the replay benchmark.",
+        "pool": SMTPConnectionPool(starttls=False),
+    }
+
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    collected = []
+    with output:
+        listener = VoiceListener(
+            trigger_phrases=trigger_phrases or ["send email"],
+            trigger_count=trigger_count,
+            email_config=email_config,
+            recognition_workers=workers,
+            recognition_queue_size=queue_size,
+            drop_policy=drop_policy,
+            vad_config=vad_config,
+            fuzzy_config=fuzzy_config,
+            outbox_path=os.path.join(workdir, "outbox.db") if outbox else None,
+            streaming_config=streaming_config,
+        )
+        # Replay the corpus instead of the microphone, with a fixed energy threshold
+        listener.microphone = source
+        listener.mic_available = True
+        listener.recognizer.recognize_google = stub
+        listener.recognizer.dynamic_energy_threshold = False
+
+        last_seq = listener.events.last_seq()
+        started = time.time()
+        listener.start_listening(duration_mins=24 * 60)
+        try:
+            while not source.exhausted:
+                new_events, last_seq = listener.events.wait(last_seq, timeout=0.2)
+                collected.extend(new_events)
+
+            # Let queued clips finish recognition before stopping capture
+            deadline = time.time() + drain_timeout
+            while listener.pipeline and listener.pipeline.qsize() and time.time() < deadline:
+                time.sleep(0.01)
+            listener.request_stop()
+            source.close()
+            if listener._thread:
+                listener._thread.join(timeout=drain_timeout)
+            elapsed = time.time() - started
+
+            # Wait for emails still on their way to the stand-in server
+            if listener.outbox:
+                while listener.outbox.get_depth() and time.time() < deadline:
+                    time.sleep(0.01)
+            listener.stop_listening()
+        finally:
+            source.close()
+            smtp_server.stop()
+
+        new_events, last_seq = listener.events.wait(last_seq, timeout=0)
+        collected.extend(new_events)
+
+    detection = []
+    thresholds = []
+    for event in collected:
+        if event.type == events.TRIGGER_DETECTED:
+            segment = getattr(event.data.get("text"), "segment", None)
+            if segment is not None and source.ended_at[segment] is not None:
+                detection.append(max(0.0, event.timestamp - source.ended_at[segment]))
+        elif event.type == events.COUNT_CHANGED and event.data.get("count") == trigger_count:
+            thresholds.append(event.timestamp)
+
+    # Emails are sent in the order thresholds were reached
+    email = [received - reached for reached, (received, _) in zip(thresholds, smtp_server.received)]
+
+    return {
+        "recordings": len(source.paths),
+        "audio_seconds": round(source.duration, 3),
+        "elapsed_seconds": round(elapsed, 3),
+        "clips": stub.clips,
+        "clips_per_second": stub.clips / elapsed if elapsed else None,
+        "recognized": stub.recognized,
+        "triggers": len(detection),
+        "thresholds_reached": len(thresholds),
+        "emails_received": len(smtp_server.received),
+        "pipeline": listener.pipeline.get_stats() if listener.pipeline else None,
+        "detection_latency": _summarize(detection),
+        "trigger_to_email_latency": _summarize(email),
+    }
+
+
+_FUZZY_WORDS = {
+    "verbs": "send call open close play stop start check email text ring page alert notify help find show "
+             "read write lock unlock turn switch".split(),
+    "nouns": "email police mom dad office doctor door window lights music alarm garage kitchen report "
+             "message phone team boss car heater fan".split(),
+    "extra": "now please quickly the my a urgent again today".split(),
+    "chatter": "hey could you to about is it what where when sent e-mail semd".split(),
+}
+
+
+def run_fuzzy_benchmark(phrases=3000, transcripts=300, max_words=13, seed=0):
+    """Time FuzzyPhraseMatcher.find_all over random transcripts against a large phrase list.
+
+    Phrases are 2-4 word commands; transcripts are 3 to max_words words mixing
+    the same vocabulary with chatter and misspellings. The matcher is warmed
+    up on as many other transcripts first, and the window cache is cleared
+    before each timed lookup so no window is answered from it.
+    """
+    rng = random.Random(seed)
+    verbs, nouns, extra = _FUZZY_WORDS["verbs"], _FUZZY_WORDS["nouns"], _FUZZY_WORDS["extra"]
+    phrase_list = set()
+    while len(phrase_list) < phrases:
+        words = [rng.choice(verbs), rng.choice(nouns)]
+        words += [rng.choice(extra + nouns) for _ in range(rng.choice([0, 0, 1, 1, 2]))]
+        phrase_list.add(" ".join(words))
+    matcher = FuzzyPhraseMatcher(sorted(phrase_list))
+
+    vocabulary = verbs + nouns + extra + _FUZZY_WORDS["chatter"]
+    texts = [" ".join(rng.choice(vocabulary) for _ in range(rng.randint(3, max_words)))
+             for _ in range(transcripts * 2)]
+    # The second half only warms the merged postings, as a long-running listener would have
+    for text in texts[transcripts:]:
+        matcher.find_all(text)
+    texts = texts[:transcripts]
+
+    latencies = []
+    matched = 0
+    for text in texts:
+        matcher._window_cache.clear()
+        started = time.perf_counter()
+        matched += bool(matcher.find_all(text))
+        latencies.append(time.perf_counter() - started)
+    return {
+        "phrases": len(matcher),
+        "transcripts": len(texts),
+        "matched": matched,
+        "lookup_latency": _summarize(latencies),
+    }
+
+
+def _format_summary(name, summary):
+    if not summary["count"]:
+        return f"{name}: no samples"
+    return (f"{name} (n={summary['count']}): avg {summary['avg'] * 1000:.1f} ms, "
+            f"p50 {summary['p50'] * 1000:.1f} ms, p95 {summary['p95'] * 1000:.1f} ms, "
+            f"p99 {summary['p99'] * 1000:.1f} ms, max {summary['max'] * 1000:.1f} ms")
+
+
+def print_report(results):
+    print(f"Replayed {results['recordings']} recordings ({results['audio_seconds']:.1f}s of audio) "
+          f"in {results['elapsed_seconds']:.2f}s")
+    print(f"Clips: {results['clips']} ({results['clips_per_second']:.2f}/s), "
+          f"recognized: {results['recognized']}, triggers: {results['triggers']}")
+    print(f"Thresholds reached: {results['thresholds_reached']}, "
+          f"emails received: {results['emails_received']}")
+    if results["pipeline"]:
+        print(f"Pipeline: {results['pipeline']}")
+    print(_format_summary("Detection latency", results["detection_latency"]))
+    print(_format_summary("Trigger-to-email latency", results["trigger_to_email_latency"]))
+
+
+def print_fuzzy_report(results):
+    print(f"Fuzzy lookups: {results['transcripts']} transcripts against {results['phrases']} phrases, "
+          f"{results['matched']} with matches")
+    print(_format_summary("Lookup latency", results["lookup_latency"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded audio through the listening pipeline")
+    parser.add_argument("corpus", nargs="?", help="directory of WAV recordings with optional .txt transcripts")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="generate N synthetic recordings instead")
+    parser.add_argument("--phrase", action="append", help="trigger phrase (repeatable, default 'send email')")
+    parser.add_argument("--trigger-count", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.1, help="stub recognition latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=0, help="recognition workers (0 = sequential)")
+    parser.add_argument("--queue-size", type=int, default=4)
+    parser.add_argument("--drop-policy", default="block", choices=["block", "drop_newest", "drop_oldest"])
+    parser.add_argument("--realtime", action="store_true", help="pace replay like a live microphone")
+    parser.add_argument("--smtp-delay", type=float, default=0.0, help="stand-in server latency per message")
+    parser.add_argument("--outbox", action="store_true", help="deliver emails through a temporary outbox")
+    parser.add_argument("--vad", action="store_true", help="enable the voice-activity gate")
+    parser.add_argument("--stream-window", type=float, metavar="SECONDS",
+                        help="use overlapping-window streaming recognition with this window length")
+    parser.add_argument("--stream-hop", type=float, metavar="SECONDS", help="streaming hop (default: half the window)")
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON to PATH")
+    parser.add_argument("--verbose", action="store_true", help="show listener output")
+    parser.add_argument("--min-clips-per-second", type=float)
+    parser.add_argument("--max-detection-p95", type=float, metavar="SECONDS")
+    parser.add_argument("--max-email-p95", type=float, metavar="SECONDS")
+    parser.add_argument("--fuzzy", type=int, metavar="N",
+                        help="time fuzzy phrase lookups against N phrases instead of replaying audio")
+    parser.add_argument("--max-fuzzy-p95", type=float, metavar="SECONDS")
+    args = parser.parse_args(argv)
+
+    if args.fuzzy:
+        results = run_fuzzy_benchmark(args.fuzzy, seed=args.seed)
+        print_fuzzy_report(results)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+        p95 = results["lookup_latency"]["p95"]
+        if args.max_fuzzy_p95 is not None and p95 > args.max_fuzzy_p95:
+            print(f"FAIL: lookup_latency p95 {p95} > {args.max_fuzzy_p95}", file=sys.stderr)
+            return 1
+        return 0
+
+    if args.synthetic:
+        phrase = args.phrase[0] if args.phrase else "send email"
+        corpus = make_synthetic_corpus(tempfile.mkdtemp(prefix="voice-corpus-"), args.synthetic,
+                                       trigger_phrase=phrase, seed=args.seed)
+    elif args.corpus:
+        corpus = args.corpus
+    else:
+        parser.error("either a corpus directory or --synthetic is required")
+
+    recordings = load_corpus(corpus)
+    if not recordings:
+        parser.error(f"no WAV recordings found in {corpus}")
+
+    results = run_benchmark(
+        recordings,
+        trigger_phrases=args.phrase,
+        trigger_count=args.trigger_count,
+        latency=args.latency,
+        jitter=args.jitter,
+        seed=args.seed,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        drop_policy=args.drop_policy,
+        realtime=args.realtime,
+        smtp_delay=args.smtp_delay,
+        outbox=args.outbox,
+        vad_config={} if args.vad else None,
+        streaming_config=({"window": args.stream_window, "hop": args.stream_hop or args.stream_window / 2}
+                          if args.stream_window else None),
+        verbose=args.verbose,
+    )
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    # Non-zero exit status when a regression threshold is exceeded
+    failures = []
+    if args.min_clips_per_second is not None and (results["clips_per_second"] or 0) < args.min_clips_per_second:
+        failures.append(f"clips/sec {results['clips_per_second']:.2f} < {args.min_clips_per_second}")
+    for option, key in ((args.max_detection_p95, "detection_latency"),
+                        (args.max_email_p95, "trigger_to_email_latency")):
+        p95 = results[key]["p95"]
+        if option is not None and (p95 is None or p95 > option):
+            failures.append(f"{key} p95 {p95} > {option}")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,37 @@
+import copy
 import json
 import os
+import threading
 import streamlit as st
 
+# Optional file watching; without it, changes are detected by polling mtimes on access
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+
+CONFIG_PATH = "config.json"
+SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+# Streamlit also reads secrets from the user's home directory
+GLOBAL_SECRETS_PATH = os.path.join(os.path.expanduser("~"), ".streamlit", "secrets.toml")
+
 class ConfigHandler:
-    """Handles loading and accessing configuration from Streamlit secrets or config.json"""
+    """Handles loading and accessing configuration from Streamlit secrets or config.json
+    
+    The configuration is parsed once and served from memory. It is reloaded when
+    config.json or either secrets.toml (the project's or ~/.streamlit's)
+    changes on disk (checked by mtime, or immediately on a watchdog event once
+    watch() has been called). Callers get their own copy, so changing it does
+    not affect the cache.
+    """
+    
+    _lock = threading.Lock()
+    _cache = None
+    _loaded = False
+    _mtimes = None
+    _observer = None
     
     @staticmethod
     def get_config():
@@ -11,27 +39,75 @@ class ConfigHandler:
         Load configuration from Streamlit secrets or config.json file
         Returns a dictionary with email_config, contacts, and cc_list
         """
-        # First try Streamlit secrets (works both locally and deployed)
-        if hasattr(st, "secrets") and "email_config" in st.secrets:
+        mtimes = ConfigHandler._file_mtimes()
+        with ConfigHandler._lock:
+            if not ConfigHandler._loaded or mtimes != ConfigHandler._mtimes:
+                ConfigHandler._cache = ConfigHandler._load_config()
+                ConfigHandler._mtimes = mtimes
+                ConfigHandler._loaded = True
+            return copy.deepcopy(ConfigHandler._cache)
+    
+    @staticmethod
+    def invalidate():
+        """Drop the cached configuration so the next access reloads it"""
+        with ConfigHandler._lock:
+            ConfigHandler._loaded = False
+    
+    @staticmethod
+    def watch():
+        """Invalidate the cache as soon as config files change (requires watchdog)"""
+        if not WATCHDOG_AVAILABLE or ConfigHandler._observer is not None:
+            return False
+        
+        watched = {os.path.abspath(path) for path in (CONFIG_PATH, SECRETS_PATH, GLOBAL_SECRETS_PATH)}
+        
+        class _ConfigEventHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                paths = {event.src_path, getattr(event, "dest_path", None) or event.src_path}
+                if {os.path.abspath(path) for path in paths} & watched:
+                    ConfigHandler.invalidate()
+        
+        observer = Observer()
+        for directory in {os.path.dirname(path) for path in watched}:
+            if os.path.isdir(directory):
+                observer.schedule(_ConfigEventHandler(), directory, recursive=False)
+        observer.daemon = True
+        observer.start()
+        ConfigHandler._observer = observer
+        return True
+    
+    @staticmethod
+    def _file_mtimes():
+        mtimes = []
+        for path in (CONFIG_PATH, SECRETS_PATH, GLOBAL_SECRETS_PATH):
             try:
-                config = {
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+    
+    @staticmethod
+    def _load_config():
+        # First try Streamlit secrets (works both locally and deployed)
+        try:
+            if hasattr(st, "secrets") and "email_config" in st.secrets:
+                return {
                     "email_config": dict(st.secrets["email_config"]),
                     "contacts": list(st.secrets["contacts"]) if "contacts" in st.secrets else [],
                     "cc_list": list(st.secrets["cc_list"]) if "cc_list" in st.secrets else []
                 }
-                return config
+        except Exception as e:
+            st.error(f"Error loading secrets: {e}")
+        
+        # Fall back to config.json if there are no usable secrets
+        if os.path.exists(CONFIG_PATH):
+            try:
+                with open(CONFIG_PATH, "r") as f:
+                    return json.load(f)
             except Exception as e:
-                st.error(f"Error loading secrets: {e}")
-                
-                # Fallback to config.json if secrets failed
-                if os.path.exists("config.json"):
-                    try:
-                        with open("config.json", "r") as f:
-                            return json.load(f)
-                    except Exception as e:
-                        st.error(f"Error loading config.json: {e}")
-                
-                return None
+                st.error(f"Error loading config.json: {e}")
+        
+        return None
     
     @staticmethod
     def get_email_config():
@@ -0,0 +1,234 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class EmailOutbox:
+    """Durable outbox that delivers emails on a background thread.
+
+    enqueue() writes the message to a local SQLite database and returns at once.
+    A dispatcher thread sends due messages through the EmailSender, retrying
+    failures with exponential backoff. Undelivered messages stay in the database
+    and are picked up again the next time the outbox is started.
+
+    Several outboxes (app sessions, listeners) may share one database: each row
+    records the sending account (server, port, sender) and is only delivered by
+    an outbox for that account, and a row is claimed ('sending') before delivery
+    so no two dispatchers send it. A claim left behind by a crash expires after
+    claim_timeout seconds; the dispatcher returns expired claims to the queue
+    every claim_check_interval seconds.
+    """
+
+    def __init__(self, email_sender, path="data/outbox.db", max_attempts=5,
+                 base_delay=2, max_delay=300, on_result=None, claim_timeout=600, claim_check_interval=60):
+        self.email_sender = email_sender
+        self.sender_key = f"{email_sender.smtp_server}:{email_sender.smtp_port}:{email_sender.sender}"
+        self.path = path
+        self.claim_timeout = claim_timeout
+        self.claim_check_interval = claim_check_interval
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.on_result = on_result  # called as on_result(message_id, success)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread = None
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                next_attempt_at REAL NOT NULL,
+                sent_at REAL,
+                last_error TEXT,
+                sender_key TEXT NOT NULL DEFAULT ''
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+        self._db.commit()
+
+    def enqueue(self, **send_kwargs):
+        """Persist a message (EmailSender.send_email keyword arguments) and return its id"""
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO outbox (payload, created_at, next_attempt_at, sender_key) VALUES (?, ?, ?, ?)",
+                (json.dumps(send_kwargs), now, now, self.sender_key)
+            )
+            self._db.commit()
+        self._wakeup.set()
+        return cursor.lastrowid
+
+    def start(self):
+        with self._thread_lock:
+            self._running = True
+            if self._thread is not None:
+                # The previous dispatcher is still finishing a send; it carries on
+                return
+            self._thread = threading.Thread(target=self._dispatch_loop, name="email-outbox")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self, timeout=2):
+        """Stop the dispatcher; undelivered messages remain queued on disk"""
+        with self._thread_lock:
+            self._running = False
+            thread = self._thread
+        self._wakeup.set()
+        if thread and thread.is_alive():
+            thread.join(timeout=timeout)
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            self._db.close()
+
+    def get_depth(self):
+        """Number of messages still waiting to be delivered"""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending' AND sender_key = ?",
+                                    (self.sender_key,)).fetchone()[0]
+
+    def get_stats(self):
+        """Queue depth, delivery counts and enqueue-to-delivery latency in seconds"""
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM outbox WHERE sender_key = ? GROUP BY status",
+                                           (self.sender_key,)).fetchall())
+            latencies = [row[0] for row in self._db.execute(
+                "SELECT sent_at - created_at FROM outbox WHERE status = 'sent' AND sender_key = ? "
+                "ORDER BY sent_at DESC LIMIT 1000", (self.sender_key,)
+            )]
+
+        latencies.sort()
+        return {
+            "pending": counts.get("pending", 0),
+            "sending": counts.get("sending", 0),
+            "sent": counts.get("sent", 0),
+            "failed": counts.get("failed", 0),
+            "latency_avg": sum(latencies) / len(latencies) if latencies else None,
+            "latency_p95": latencies[int(0.95 * (len(latencies) - 1))] if latencies else None,
+        }
+
+    def pending_attachments(self):
+        """Attachment paths of every undelivered message in the database, for any sender"""
+        with self._lock:
+            rows = self._db.execute("SELECT payload FROM outbox WHERE status IN ('pending', 'sending')").fetchall()
+        paths = (json.loads(payload).get("attachment_path") for payload, in rows)
+        return {path for path in paths if path}
+
+    def _release_expired_claims(self):
+        """Return rows claimed by a dispatcher that died mid-send to the queue"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE outbox SET status = 'pending' WHERE status = 'sending' AND sender_key = ? "
+                "AND next_attempt_at <= ?", (self.sender_key, time.time())
+            )
+            self._db.commit()
+
+    def _next_due(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT id, payload, attempts, next_attempt_at FROM outbox "
+                "WHERE status = 'pending' AND sender_key = ? ORDER BY next_attempt_at, id LIMIT 1",
+                (self.sender_key,)
+            ).fetchone()
+
+    def _claim(self, message_id):
+        """Mark a row as being sent; False if another dispatcher got it first"""
+        with self._lock:
+            # While claimed, next_attempt_at holds the claim's expiry
+            cursor = self._db.execute(
+                "UPDATE outbox SET status = 'sending', next_attempt_at = ? WHERE id = ? AND status = 'pending'",
+                (time.time() + self.claim_timeout, message_id)
+            )
+            self._db.commit()
+            return cursor.rowcount == 1
+
+    def _dispatch_loop(self):
+        next_claim_check = 0
+        while True:
+            with self._thread_lock:
+                if not self._running:
+                    self._thread = None
+                    return
+            now = time.time()
+            if now >= next_claim_check:
+                # Another dispatcher on this database may have died mid-send
+                self._release_expired_claims()
+                next_claim_check = now + self.claim_check_interval
+
+            row = self._next_due()
+            delay = next_claim_check - now
+            if row is not None:
+                delay = min(delay, row[3] - now)
+            if row is None or delay > 0:
+                # Sleep until a retry or claim check is due, or until a new message arrives
+                self._wakeup.wait(delay)
+                self._wakeup.clear()
+                continue
+
+            message_id, payload, attempts, _ = row
+            if self._claim(message_id):
+                self._deliver(message_id, json.loads(payload), attempts)
+
+    def _deliver(self, message_id, send_kwargs, attempts):
+        error = None
+        try:
+            success = self.email_sender.send_email(raise_errors=True, **send_kwargs)
+        except Exception as e:
+            success = False
+            error = f"{type(e).__name__}: {e}"
+        if not success and error is None:
+            error = "send_email reported failure"
+
+        attempts += 1
+        now = time.time()
+        with self._lock:
+            if success:
+                self._db.execute(
+                    "UPDATE outbox SET status = 'sent', attempts = ?, sent_at = ? WHERE id = ?",
+                    (attempts, now, message_id)
+                )
+            elif attempts >= self.max_attempts:
+                self._db.execute(
+                    "UPDATE outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                    (attempts, error, message_id)
+                )
+            else:
+                backoff = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+                self._db.execute(
+                    "UPDATE outbox SET status = 'pending', attempts = ?, next_attempt_at = ?, last_error = ? "
+                    "WHERE id = ?",
+                    (attempts, now + backoff, error, message_id)
+                )
+            self._db.commit()
+
+        if success:
+            logger.info(f"Outbox message {message_id} delivered after {attempts} attempt(s)")
+        elif attempts >= self.max_attempts:
+            logger.error(f"Outbox message {message_id} failed after {attempts} attempts")
+        else:
+            logger.warning(f"Outbox message {message_id} failed, retrying (attempt {attempts}/{self.max_attempts})")
+
+        if self.on_result and (success or attempts >= self.max_attempts):
+            try:
+                self.on_result(message_id, success)
+            except Exception as e:
+                logger.error(f"Outbox result callback failed: {e}")
@@ -1,18 +1,28 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.audio import MIMEAudio
 import os
+import smtplib
+import re
 import logging
-import mimetypes
+import time
+from smtp_pool import default_pool
+from message_cache import MessageTemplateCache
+from metrics import registry as metrics
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+_PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+
+def _personalize(template, fields):
+    """Fill {field} placeholders from a contact, leaving any other braces (e.g. CSS) alone"""
+    return _PLACEHOLDER_RE.sub(lambda m: str(fields.get(m.group(1), m.group(0))), template)
+
+
 class EmailSender:
     def __init__(self, sender, password, server="Gmail", to_emails=None, cc_emails=None, 
                 subject=None, body=None, html_content=False, smtp_server=None, smtp_port=None,
-                attachment_path=None):
+                attachment_path=None, pool=None, message_cache=None, transcoder=None):
         self.sender = sender
         self.password = password
         self.server_type = server
@@ -23,6 +33,16 @@ class EmailSender:
         self.html_content = html_content
         self.attachment_path = attachment_path
         
+        # Authenticated SMTP sessions are shared through a pool instead of
+        # reconnecting and logging in for every message
+        self.pool = pool or default_pool
+        
+        # Encoded message bodies and attachments are built once and reused per send
+        self.message_cache = message_cache or MessageTemplateCache()
+        
+        # Optional audio_handler.AttachmentTranscoder that shrinks large attachments
+        self.transcoder = transcoder
+        
         # Set SMTP settings based on provider
         if smtp_server and smtp_port:  # Custom SMTP
             self.smtp_server = smtp_server
@@ -37,8 +57,12 @@ class EmailSender:
             raise ValueError("Unsupported email server type")
             
     def send_email(self, subject=None, body=None, to_emails=None, cc_emails=None, 
-                   html_content=None, attachment_path=None):
-        """Send an email with the configured settings"""
+                   html_content=None, attachment_path=None, raise_errors=False):
+        """Send an email with the configured settings.
+
+        Returns True on success and False on failure, or with raise_errors=True
+        raises the failure instead so callers can record why it failed.
+        """
         subject = subject or self.default_subject
         body = body or self.default_body
         to_emails = to_emails or self.to_emails
@@ -48,68 +72,232 @@ class EmailSender:
         
         if not to_emails:
             logger.error("No recipient emails specified")
+            if raise_errors:
+                raise ValueError("No recipient emails specified")
             return False
             
         try:
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = self.sender
-            msg['To'] = ", ".join(to_emails)
-            if cc_emails:
-                msg['Cc'] = ", ".join(cc_emails)
-            msg['Subject'] = subject
-            
-            # Attach body
-            if html_content:
-                msg.attach(MIMEText(body, 'html'))
-            else:
-                msg.attach(MIMEText(body, 'plain'))
+            msg = self._render_message(subject, body, to_emails, cc_emails, html_content, attachment_path)
             
-            # Attach audio file if provided
-            if attachment_path and os.path.exists(attachment_path):
-                try:
-                    # Determine MIME type
-                    ctype, encoding = mimetypes.guess_type(attachment_path)
-                    if ctype is None or encoding is not None:
-                        ctype = 'application/octet-stream'
-                    maintype, subtype = ctype.split('/', 1)
-                    
-                    if maintype == 'audio':
-                        with open(attachment_path, 'rb') as fp:
-                            attachment = MIMEAudio(fp.read(), _subtype=subtype)
-                        
-                        # Add header to make the attachment downloadable
-                        filename = os.path.basename(attachment_path)
-                        attachment.add_header('Content-Disposition', 'attachment', filename=filename)
-                        msg.attach(attachment)
-                        logger.info(f"Attached audio file: {filename}")
-                except Exception as e:
-                    logger.error(f"Failed to attach audio file: {e}")
-            
-            # Connect to server
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.sender, self.password)
-            
-            # Send email
+            # Send email over a pooled connection
             all_recipients = to_emails + cc_emails
-            server.sendmail(self.sender, all_recipients, msg.as_string())
-            server.quit()
+            self._sendmail(all_recipients, msg)
             
             logger.info(f"Email sent to {len(all_recipients)} recipients")
             return True
             
         except Exception as e:
             logger.error(f"Failed to send email: {e}")
+            if raise_errors:
+                raise
             return False
             
+    def send_many(self, recipients, subject=None, body=None, html_content=None,
+                  attachment_path=None, personalize=None, max_per_session=100):
+        """Send one personalized message per recipient over pooled SMTP sessions.
+
+        recipients may be email addresses or contact dicts with an "email" key
+        (as returned by ConfigHandler.get_contacts()). Subject and body are
+        formatted with the contact's fields, e.g. "Hello {name}", and personalize
+        can return further per-recipient overrides. Each session carries at most
+        max_per_session messages before it is replaced. An address listed more
+        than once is only sent to once. If no session can be opened, the rest
+        of the batch fails with that error instead of retrying per recipient.
+
+        Returns a dict with per-recipient results (True or an error string),
+        keyed by address ("contact #<index>" for contacts without one),
+        sent/failed/duplicate counts and throughput in messages per second.
+        """
+        subject = subject or self.default_subject
+        body = body or self.default_body
+        html_content = html_content if html_content is not None else self.html_content
+        attachment_path = attachment_path or self.attachment_path
+
+        key = (self.smtp_server, self.smtp_port, self.sender)
+        results = {}
+        seen = set()
+        sent = failed = duplicates = 0
+        server = None
+        session_sent = 0
+        connect_error = None
+        start_time = time.time()
+
+        try:
+            for index, recipient in enumerate(recipients):
+                fields = dict(recipient) if isinstance(recipient, dict) else {"email": recipient}
+                address = fields.get("email")
+                if not address:
+                    logger.error(f"Skipping contact without an email address: {recipient}")
+                    results[f"contact #{index}"] = "No email address"
+                    failed += 1
+                    continue
+                if address.lower() in seen:
+                    logger.warning(f"Skipping duplicate recipient: {address}")
+                    duplicates += 1
+                    continue
+                seen.add(address.lower())
+                if connect_error is not None:
+                    results[address] = connect_error
+                    failed += 1
+                    continue
+
+                try:
+                    overrides = personalize(recipient) if personalize else {}
+                    msg = self._render_message(
+                        _personalize(overrides.get("subject", subject), fields),
+                        _personalize(overrides.get("body", body), fields),
+                        [address], [], overrides.get("html_content", html_content),
+                        overrides.get("attachment_path", attachment_path)
+                    )
+                except Exception as e:
+                    results[address] = f"Failed to build message: {e}"
+                    failed += 1
+                    continue
+
+                for attempt in range(2):
+                    if server is None:
+                        try:
+                            server = self.pool.acquire(key, self.password)
+                        except Exception as e:
+                            # The server is unreachable or refused the login; so would every later attempt
+                            connect_error = results[address] = str(e)
+                            break
+                        session_sent = 0
+
+                    try:
+                        self._deliver(server, [address], msg)
+                        results[address] = True
+                        session_sent += 1
+                        break
+                    except smtplib.SMTPServerDisconnected as e:
+                        # Session dropped mid-batch: retry this recipient once on a new one
+                        self.pool.discard(key, server)
+                        server = None
+                        results[address] = str(e)
+                    except smtplib.SMTPException as e:
+                        # Rejected by the server (bad recipient etc.); the session is still usable
+                        results[address] = str(e)
+                        try:
+                            server.rset()
+                        except Exception:
+                            self.pool.discard(key, server)
+                            server = None
+                        break
+                    except OSError as e:
+                        self.pool.discard(key, server)
+                        server = None
+                        results[address] = str(e)
+
+                if results.get(address) is True:
+                    sent += 1
+                else:
+                    failed += 1
+
+                if server is not None and session_sent >= max_per_session:
+                    # Providers cap messages per session, so rotate to a fresh one
+                    self.pool.discard(key, server)
+                    server = None
+        finally:
+            if server is not None:
+                self.pool.release(key, server)
+
+        elapsed = time.time() - start_time
+        logger.info(f"Bulk send finished: {sent} sent, {failed} failed in {elapsed:.2f}s")
+        return {
+            "results": results,
+            "sent": sent,
+            "failed": failed,
+            "duplicates": duplicates,
+            "elapsed": elapsed,
+            "messages_per_second": sent / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def _render_message(self, subject, body, to_emails, cc_emails, html_content, attachment_path):
+        """Prepare a message for sending, reusing the cached encoded body and attachment.
+
+        Returns the flattened message as a string, or for large attachments a
+        zero-argument callable that yields the message in chunks for _stream_data.
+        """
+        if attachment_path and not os.path.exists(attachment_path):
+            # e.g. an evidence clip pruned while its message waited in the outbox
+            logger.warning(f"Attachment {attachment_path} no longer exists, sending without it")
+            attachment_path = None
+        if self.transcoder and attachment_path:
+            attachment_path = self.transcoder.transcode(attachment_path)
+
+        args = (self.sender, subject, to_emails, cc_emails, body, html_content, attachment_path)
+        if self.message_cache.is_streamed(attachment_path):
+            return lambda: self.message_cache.iter_data(*args)
+        return self.message_cache.render(*args)
+
+    def _deliver(self, server, recipients, message):
+        try:
+            with metrics.timer("smtp_send_seconds", server=self.smtp_server):
+                if callable(message):
+                    refused = self._stream_data(server, recipients, message())
+                else:
+                    refused = server.sendmail(self.sender, recipients, message)
+        except Exception:
+            metrics.inc("smtp_send_total", server=self.smtp_server, result="error")
+            raise
+        metrics.inc("smtp_send_total", server=self.smtp_server, result="ok")
+        return refused
+
+    def _stream_data(self, server, recipients, chunks):
+        """sendmail() equivalent that writes the DATA section to the socket chunk by chunk.
+
+        chunks must already be CRLF-terminated and dot-stuffed (see
+        MessageTemplateCache.iter_data), so the message is never held in memory whole.
+        """
+        server.ehlo_or_helo_if_needed()
+        code, resp = server.mail(self.sender)
+        if code != 250:
+            server.rset()
+            raise smtplib.SMTPSenderRefused(code, resp, self.sender)
+
+        refused = {}
+        for recipient in recipients:
+            code, resp = server.rcpt(recipient)
+            if code not in (250, 251):
+                refused[recipient] = (code, resp)
+        if len(refused) == len(recipients):
+            server.rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+
+        code, resp = server.docmd("data")
+        if code != 354:
+            server.rset()
+            raise smtplib.SMTPDataError(code, resp)
+
+        for chunk in chunks:
+            server.send(chunk)
+        server.send(b".\r\n")
+
+        code, resp = server.getreply()
+        if code != 250:
+            server.rset()
+            raise smtplib.SMTPDataError(code, resp)
+        return refused
+
+    def _sendmail(self, recipients, message):
+        """Send a prepared message, reconnecting once if the pooled session went stale"""
+        for attempt in range(2):
+            try:
+                with self.pool.connection(self.smtp_server, self.smtp_port, self.sender, self.password) as server:
+                    return self._deliver(server, recipients, message)
+            except smtplib.SMTPServerDisconnected:
+                if attempt:
+                    raise
+                logger.warning("SMTP session was disconnected, retrying on a new connection")
+
     def test_connection(self):
-        """Test the SMTP connection"""
+        """Test the SMTP connection and credentials.
+
+        Uses a fresh login rather than a pooled session, which would pass even
+        with a wrong password once a session for this sender exists.
+        """
         try:
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.sender, self.password)
-            server.quit()
+            self.pool.verify(self.smtp_server, self.smtp_port, self.sender, self.password)
             return True
         except Exception as e:
             logger.error(f"Connection test failed: {e}")
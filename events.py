@@ -0,0 +1,52 @@
+import collections
+import threading
+import time
+
+# Event types published by VoiceListener
+TRIGGER_DETECTED = "trigger_detected"
+COUNT_CHANGED = "count_changed"
+RULE_FIRED = "rule_fired"
+EMAIL_QUEUED = "email_queued"
+EMAIL_SENT = "email_sent"
+EMAIL_FAILED = "email_failed"
+STOPPED = "stopped"
+
+ListenerEvent = collections.namedtuple("ListenerEvent", ["seq", "type", "data", "timestamp"])
+
+
+class EventChannel:
+    """Thread-safe, multi-reader event log with blocking waits.
+
+    Publishers append events with increasing sequence numbers. Readers keep the
+    last sequence number they saw and call wait() to block until newer events
+    arrive, so several readers (e.g. successive Streamlit reruns) can follow the
+    same channel without consuming each other's events. Only the most recent
+    `history` events are kept.
+    """
+
+    def __init__(self, history=256):
+        self._cond = threading.Condition()
+        self._events = collections.deque(maxlen=history)
+        self._seq = 0
+
+    def publish(self, event_type, **data):
+        with self._cond:
+            self._seq += 1
+            event = ListenerEvent(self._seq, event_type, data, time.time())
+            self._events.append(event)
+            self._cond.notify_all()
+        return event
+
+    def wait(self, after_seq=0, timeout=None):
+        """Block until there are events newer than after_seq, or until timeout.
+
+        Returns (events, last_seq); events is empty on timeout.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after_seq, timeout)
+            events = [event for event in self._events if event.seq > after_seq]
+            return events, self._seq
+
+    def last_seq(self):
+        with self._cond:
+            return self._seq
@@ -0,0 +1,351 @@
+import re
+import threading
+from collections import Counter, namedtuple
+from itertools import chain
+
+FuzzyMatch = namedtuple("FuzzyMatch", ["phrase", "score", "text"])
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+_SOUNDEX_CODES = {}
+for _letters, _code in (("bfpv", "1"), ("cgjkqsxz", "2"), ("dt", "3"),
+                        ("l", "4"), ("mn", "5"), ("r", "6")):
+    for _ch in _letters:
+        _SOUNDEX_CODES[_ch] = _code
+
+
+def tokenize(text):
+    """Lower-case text and split it into words, joining hyphenated words ("e-mail" -> "email")"""
+    return _TOKEN_RE.findall(text.lower().replace("-", ""))
+
+
+def _occurrences(items):
+    """Set of items with repeats tagged by their count ("ab", "ab2", "ab3", ...), so
+    that set operations count shared items like multiset operations would"""
+    items = list(items)
+    unique = frozenset(items)
+    if len(unique) == len(items):
+        return unique
+    seen = set()
+    for item in items:
+        if item in seen:
+            k = 2
+            while f"{item}{k}" in seen:
+                k += 1
+            item = f"{item}{k}"
+        seen.add(item)
+    return frozenset(seen)
+
+
+def soundex(word):
+    """Classic four character Soundex code for a single word"""
+    word = "".join(ch for ch in word if ch.isalpha())
+    if not word:
+        return ""
+
+    code = word[0].upper()
+    last = _SOUNDEX_CODES.get(word[0], "")
+    for ch in word[1:]:
+        digit = _SOUNDEX_CODES.get(ch, "")
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        # h and w do not separate letters with the same code, vowels do
+        if ch not in "hw":
+            last = digit
+    return code.ljust(4, "0")
+
+
+def bounded_edit_distance(a, b, max_distance):
+    """Levenshtein distance between a and b, or max_distance + 1 if it exceeds the bound.
+
+    Only the diagonal band of width 2 * max_distance + 1 is computed; cells
+    outside it cannot lead to a distance within the bound.
+    """
+    too_far = max_distance + 1
+    if abs(len(a) - len(b)) > max_distance:
+        return too_far
+    if a == b:
+        return 0
+
+    previous = [j if j <= max_distance else too_far for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        low = max(1, i - max_distance)
+        high = min(len(b), i + max_distance)
+        current = [too_far] * (len(b) + 1)
+        current[0] = i if i <= max_distance else too_far
+        row_min = current[0] if low == 1 else too_far
+        for j in range(low, high + 1):
+            cost = previous[j - 1] + (ca != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > max_distance:
+            return too_far
+        previous = current
+    return min(previous[-1], too_far)
+
+
+class FuzzyPhraseMatcher:
+    """Indexed fuzzy matcher for trigger phrases that recognizers tend to mis-transcribe.
+
+    Each phrase is indexed two ways: by the Soundex codes of its words, and by the
+    character trigrams of its space-free form, keyed by that form's length and the
+    trigram's position. A transcript is cut into word windows around each phrase
+    length. A window only looks at phrases whose length is within max_distance of
+    its own, and each of its trigrams only at phrases having it within that
+    distance of the same position; these postings are merged once per window
+    length and position and cached. The window probes them with just enough of
+    its rarest trigrams that any phrase passing the q-gram count filter must
+    appear (prefix filtering) and counts shared trigrams in one pass. Survivors
+    and phonetic candidates go through a letter-count bound and only then a
+    banded edit distance. The matches of the most recent windows are cached, as
+    transcripts keep repeating the same words.
+
+    Cold lookups grow with transcript length: with 3,000 phrases a short command
+    of up to five words takes about 0.6 ms at the median, a 13-word transcript
+    about 1.3 ms (`python benchmark.py --fuzzy 3000`). Cached windows take tens
+    of microseconds.
+    """
+
+    GRAM_SIZE = 3
+
+    def __init__(self, phrases=None, max_distance=2, min_score=0.75, use_phonetic=True, cache_size=4096):
+        self.max_distance = max_distance
+        self.min_score = min_score
+        self.use_phonetic = use_phonetic
+        self.cache_size = cache_size
+
+        self._lock = threading.Lock()
+        self._phrases = {}       # phrase -> (compact form, letter occurrences)
+        self._gram_index = {}    # (trigram, compact length, position) -> set of phrases
+        self._phonetic_index = {}  # soundex key -> set of phrases
+        self._window_sizes = {}  # word count -> number of phrases with that length
+        self._lengths = {}       # compact length -> number of phrases with that length
+        self._requirements = {}  # window length -> {phrase length: shared trigrams needed}
+        self._postings = {}      # window length -> {(trigram, position): phrases it can match}
+        self._indexed = None     # trigrams any phrase has, rebuilt after changes
+        self._window_cache = {}  # window words -> matches, oldest first
+
+        for phrase in phrases or []:
+            self.add_phrase(phrase)
+
+    @property
+    def phrases(self):
+        return list(self._phrases)
+
+    def __len__(self):
+        return len(self._phrases)
+
+    def add_phrase(self, phrase):
+        phrase = phrase.lower().strip()
+        words = tokenize(phrase)
+        if not words:
+            return False
+
+        with self._lock:
+            if phrase in self._phrases:
+                return False
+            compact = "".join(words)
+            self._phrases[phrase] = (compact, _occurrences(compact))
+            for position, gram in enumerate(self._grams(compact)):
+                self._gram_index.setdefault((gram, len(compact), position), set()).add(phrase)
+            self._phonetic_index.setdefault(self._phonetic_key(words), set()).add(phrase)
+            self._window_sizes[len(words)] = self._window_sizes.get(len(words), 0) + 1
+            self._lengths[len(compact)] = self._lengths.get(len(compact), 0) + 1
+            self._invalidate()
+        return True
+
+    def remove_phrase(self, phrase):
+        phrase = phrase.lower().strip()
+        with self._lock:
+            if phrase not in self._phrases:
+                return False
+            compact, _ = self._phrases.pop(phrase)
+            for position, gram in enumerate(self._grams(compact)):
+                key = (gram, len(compact), position)
+                postings = self._gram_index.get(key)
+                if postings:
+                    postings.discard(phrase)
+                    if not postings:
+                        del self._gram_index[key]
+            self._lengths[len(compact)] -= 1
+            if not self._lengths[len(compact)]:
+                del self._lengths[len(compact)]
+            words = tokenize(phrase)
+            key = self._phonetic_key(words)
+            postings = self._phonetic_index.get(key)
+            if postings:
+                postings.discard(phrase)
+                if not postings:
+                    del self._phonetic_index[key]
+            self._window_sizes[len(words)] -= 1
+            if not self._window_sizes[len(words)]:
+                del self._window_sizes[len(words)]
+            self._invalidate()
+        return True
+
+    def _invalidate(self):
+        self._requirements.clear()
+        self._postings.clear()
+        self._indexed = None
+        self._window_cache.clear()
+
+    def find_all(self, text):
+        """Return the best FuzzyMatch for every phrase found in text, highest score first"""
+        words = tokenize(text)
+        if not words:
+            return []
+
+        codes = [soundex(word) for word in words] if self.use_phonetic else None
+        best = {}
+        seen = set()
+        with self._lock:
+            for size in self._candidate_window_sizes():
+                for start in range(0, max(1, len(words) - size + 1)):
+                    # Repeated words give repeated windows; each is scored once
+                    key = tuple(words[start:start + size])
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    matches = self._window_cache.get(key)
+                    if matches is None:
+                        phonetic_key = " ".join(codes[start:start + size]) if codes else None
+                        matches = self._match_window(key, phonetic_key)
+                        if len(self._window_cache) >= self.cache_size:
+                            del self._window_cache[next(iter(self._window_cache))]
+                        self._window_cache[key] = matches
+                    for match in matches:
+                        current = best.get(match.phrase)
+                        if current is None or match.score > current.score:
+                            best[match.phrase] = match
+
+        return sorted(best.values(), key=lambda m: m.score, reverse=True)
+
+    def _candidate_window_sizes(self):
+        # Allow one word more or less than each phrase, to cover split or merged words
+        sizes = set()
+        for size in self._window_sizes:
+            sizes.update(s for s in (size - 1, size, size + 1) if s > 0)
+        return sorted(sizes)
+
+    def _match_window(self, window, phonetic_key=None):
+        compact = "".join(window)
+
+        phonetic = set()
+        if phonetic_key is not None:
+            phonetic = self._phonetic_index.get(phonetic_key, set())
+
+        candidates = set(phonetic)
+        candidates.update(self._gram_candidates(compact))
+        if not candidates:
+            return []
+
+        matches = []
+        text = " ".join(window)
+        letters = _occurrences(compact)
+        for phrase in candidates:
+            target, target_letters = self._phrases[phrase]
+            longest = max(len(compact), len(target))
+            # Phrases that sound alike are allowed twice the spelling distance
+            if phrase in phonetic:
+                bound = min(self.max_distance * 2, int((1.0 - self.min_score) * longest))
+            else:
+                bound = self._spelling_bound(longest)
+            # Each edit adds or removes at most one letter on either side, so the
+            # letters one string has and the other lacks bound the distance cheaply
+            if len(letters - target_letters) > bound or len(target_letters - letters) > bound:
+                continue
+            distance = bounded_edit_distance(compact, target, bound)
+            if distance > bound:
+                continue
+            score = 1.0 - distance / longest
+            if score >= self.min_score:
+                matches.append(FuzzyMatch(phrase, score, text))
+        return matches
+
+    def _gram_candidates(self, compact):
+        """Phrases close enough in spelling to compact to pass the q-gram count filter"""
+        total = len(compact)  # padded forms have as many trigrams as characters
+        required = self._requirements.get(total)
+        if required is None:
+            required = self._requirements[total] = self._required_shared(total)
+            self._postings[total] = {}
+        if not required:
+            return []
+        postings = self._postings[total]
+        if self._indexed is None:
+            self._indexed = {gram for gram, _, _ in self._gram_index}
+        indexed = self._indexed
+
+        lists = []
+        for position, gram in enumerate(self._grams(compact)):
+            # Trigrams no phrase has are never cached, so the cache stays bounded
+            if gram not in indexed:
+                continue
+            phrases = postings.get((gram, position))
+            if phrases is None:
+                phrases = postings[(gram, position)] = self._merged_postings(gram, position, total, required)
+            if phrases:
+                lists.append(phrases)
+        # A phrase sharing at least `needed` trigrams must share one of any
+        # total - needed + 1 of the window's trigrams, so only the rarest are
+        # probed; trigrams no phrase can share are free probes
+        needed = min(required.values())
+        probes = len(lists) - needed + 1
+        if probes <= 0:
+            return []
+        lists.sort(key=len)
+
+        shared = Counter(chain.from_iterable(lists[:probes]))
+        if probes < len(lists):
+            probed = shared.keys()
+            for phrases in lists[probes:]:
+                shared.update(probed & phrases)
+        phrases = self._phrases
+        return [phrase for phrase, count in shared.items()
+                if count >= needed and count >= required[len(phrases[phrase][0])]]
+
+    def _merged_postings(self, gram, position, total, required):
+        """Phrases of the lengths in required with gram close enough to position"""
+        merged = set()
+        for length in required:
+            # An edit shifts the trigrams after it by at most one position
+            shift = self._spelling_bound(max(total, length))
+            for other in range(position - shift, position + shift + 1):
+                merged.update(self._gram_index.get((gram, length, other), ()))
+        return frozenset(merged)
+
+    def _required_shared(self, total):
+        """Per phrase length: the trigrams a window of `total` characters must share.
+
+        Uses the largest distance that still scores min_score, which must cover
+        the length difference (q-gram lemma: an edit removes at most GRAM_SIZE
+        trigrams, and moves the others by at most one position). Lengths that
+        can never match are left out.
+        """
+        required = {}
+        for length in range(total - self.max_distance, total + self.max_distance + 1):
+            if length not in self._lengths:
+                continue
+            bound = self._spelling_bound(max(total, length))
+            if abs(length - total) <= bound:
+                required[length] = max(1, max(total, length) - bound * self.GRAM_SIZE)
+        return required
+
+    def _spelling_bound(self, longest):
+        # Never look further than the distance min_score would still accept
+        return min(self.max_distance, int((1.0 - self.min_score) * longest))
+
+    def _grams(self, compact):
+        """The character trigrams of compact, padded with $ at both ends, in order"""
+        padded = f"${compact}$"
+        return [padded[i:i + self.GRAM_SIZE] for i in range(len(padded) - self.GRAM_SIZE + 1)]
+
+    @staticmethod
+    def _phonetic_key(words):
+        return " ".join(soundex(word) for word in words)
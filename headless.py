@@ -0,0 +1,213 @@
+"""Run the trigger detector without a microphone or the Streamlit UI.
+
+    # Listen to a file, a directory of recordings or a PCM pipe
+    python headless.py listen recording.flac --phrase "send email"
+    arecord -f S16_LE -r 16000 -c 1 | python headless.py listen - --to ops@example.com
+
+    # Scan an archive of recordings in parallel and report which contain triggers
+    python headless.py scan archive/ --recursive --workers 8 --json report.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from audio_sources import FileSource, find_recordings, open_source
+from voice_listener import VoiceListener
+
+
+def scan_file(path, trigger_phrases, phrase_time_limit=5, vad_config=None, fuzzy_config=None, verbose=False):
+    """Recognize one recording and return every trigger detection in it.
+
+    Returns {"path", "duration", "detections": [{"time", "phrases", "text"}],
+    "error"}, where time is the offset in seconds at which the clip ended.
+    """
+    result = {"path": path, "duration": None, "detections": [], "error": None}
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        try:
+            source = FileSource(path)
+        except Exception as e:
+            result["error"] = str(e)
+            return result
+
+        try:
+            result["duration"] = source.duration
+            listener = VoiceListener(trigger_phrases=trigger_phrases, phrase_time_limit=phrase_time_limit,
+                                     vad_config=vad_config, fuzzy_config=fuzzy_config, audio_source=source)
+            while not source.exhausted:
+                with source:
+                    audio = listener.recognizer.listen(source, phrase_time_limit=min(5, phrase_time_limit))
+                if not audio.frame_data:
+                    continue
+                text = listener.recognize_audio(audio)
+                matches = listener.check_for_trigger(text) if text else []
+                if matches:
+                    result["detections"].append({"time": round(source.position, 2), "phrases": matches,
+                                                 "text": text})
+        except Exception as e:
+            result["error"] = str(e)
+        finally:
+            source.close()
+    return result
+
+
+def _scan_job(args):
+    path, kwargs = args
+    return scan_file(path, **kwargs)
+
+
+def scan_recordings(paths, trigger_phrases, max_workers=None, recursive=False, phrase_time_limit=5,
+                    vad_config=None, fuzzy_config=None, on_result=None):
+    """Scan files and directories of recordings for trigger phrases on a process pool.
+
+    Each recording is recognized independently by one worker. on_result is
+    called in the parent process as each recording finishes. Returns the
+    results of scan_file() in the order the recordings were given.
+    """
+    files = []
+    for path in paths:
+        files.extend(find_recordings(path, recursive) if os.path.isdir(path) else [path])
+    files = list(dict.fromkeys(files))
+
+    kwargs = {"trigger_phrases": trigger_phrases, "phrase_time_limit": phrase_time_limit,
+              "vad_config": vad_config, "fuzzy_config": fuzzy_config}
+    jobs = [(path, kwargs) for path in files]
+
+    executor = ProcessPoolExecutor(max_workers=max_workers) if len(jobs) > 1 and max_workers != 1 else None
+    results = []
+    try:
+        # chunksize=1 keeps workers busy when recording lengths vary widely
+        outputs = executor.map(_scan_job, jobs, chunksize=1) if executor else map(_scan_job, jobs)
+        for result in outputs:
+            results.append(result)
+            if on_result:
+                on_result(result)
+    finally:
+        if executor:
+            executor.shutdown()
+    return results
+
+
+def _print_scan_result(result):
+    if result["error"]:
+        print(f"ERROR    {result['path']}: {result['error']}")
+    elif result["detections"]:
+        times = ", ".join(f"{d['time']:.1f}s" for d in result["detections"])
+        print(f"TRIGGER  {result['path']} ({len(result['detections'])} at {times})")
+    else:
+        print(f"clean    {result['path']}")
+
+
+def _email_config(args):
+    from config_handler import ConfigHandler
+
+    config = ConfigHandler.get_email_config()
+    if not config:
+        raise SystemExit("Email requested but no email_config found in config.json or secrets")
+    return {
+        "sender": config["sender_email"],
+        "password": config["password"],
+        "smtp_server": config["smtp_server"],
+        "smtp_port": config["port"],
+        "subject": args.subject,
+        "body": "Trigger phrase detected by the headless listener.",
+        "to_emails": args.to,
+    }
+
+
+def listen(args):
+    # The PCM format only applies to stdin and named pipes
+    source = open_source(args.source, sample_rate=args.rate, sample_width=args.width, channels=args.channels)
+
+    listener = VoiceListener(
+        trigger_phrases=args.phrase or ["send email"],
+        response_audio_path=args.response,
+        trigger_count=args.trigger_count,
+        email_config=_email_config(args) if args.to else None,
+        phrase_time_limit=args.phrase_time_limit,
+        recognition_workers=args.workers,
+        fuzzy_config={} if args.fuzzy else None,
+        vad_config={} if args.vad else None,
+        audio_source=source,
+        streaming_config=({"window": args.stream_window, "hop": args.stream_hop or args.stream_window / 2}
+                          if args.stream_window else None),
+    )
+    listener.start_listening(duration_mins=args.minutes)
+    try:
+        while listener.is_running():
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        print("Interrupted")
+    finally:
+        listener.stop_listening()
+        source.close()
+    return 0
+
+
+def scan(args):
+    results = scan_recordings(
+        args.paths,
+        trigger_phrases=args.phrase or ["send email"],
+        max_workers=args.workers,
+        recursive=args.recursive,
+        phrase_time_limit=args.phrase_time_limit,
+        vad_config={} if args.vad else None,
+        fuzzy_config={} if args.fuzzy else None,
+        on_result=_print_scan_result,
+    )
+
+    triggered = [r for r in results if r["detections"]]
+    errors = [r for r in results if r["error"]]
+    print(f"Scanned {len(results)} recordings: {len(triggered)} with triggers, {len(errors)} errors")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 1 if errors else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless trigger phrase detection")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(sub):
+        sub.add_argument("--phrase", action="append", help="trigger phrase (repeatable, default 'send email')")
+        sub.add_argument("--phrase-time-limit", type=int, default=5)
+        sub.add_argument("--fuzzy", action="store_true", help="also accept near-miss transcriptions")
+        sub.add_argument("--vad", action="store_true", help="skip clips without speech before recognition")
+
+    listen_parser = subparsers.add_parser("listen", help="run the listener on a file, directory or PCM stream")
+    listen_parser.add_argument("source", help="audio file, directory of recordings, named pipe, or - for stdin")
+    add_common(listen_parser)
+    listen_parser.add_argument("--trigger-count", type=int, default=3)
+    listen_parser.add_argument("--minutes", type=float, default=60)
+    listen_parser.add_argument("--workers", type=int, default=0, help="recognition workers (0 = sequential)")
+    listen_parser.add_argument("--response", help="WAV file to play on each detection")
+    listen_parser.add_argument("--stream-window", type=float, metavar="SECONDS",
+                               help="recognize overlapping windows of this length instead of phrases")
+    listen_parser.add_argument("--stream-hop", type=float, metavar="SECONDS", help="window hop (default: half the window)")
+    listen_parser.add_argument("--to", action="append", help="email recipient when the threshold is reached")
+    listen_parser.add_argument("--subject", default="Voice Triggered Email")
+    listen_parser.add_argument("--rate", type=int, default=16000, help="raw PCM sample rate")
+    listen_parser.add_argument("--width", type=int, default=2, help="raw PCM bytes per sample")
+    listen_parser.add_argument("--channels", type=int, default=1, help="raw PCM channel count")
+    listen_parser.set_defaults(handler=listen)
+
+    scan_parser = subparsers.add_parser("scan", help="report which recordings contain trigger phrases")
+    scan_parser.add_argument("paths", nargs="+", help="recordings or directories of recordings")
+    add_common(scan_parser)
+    scan_parser.add_argument("--recursive", action="store_true", help="include subdirectories")
+    scan_parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    scan_parser.add_argument("--json", metavar="PATH", help="also write results as JSON to PATH")
+    scan_parser.set_defaults(handler=scan)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
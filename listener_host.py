@@ -0,0 +1,98 @@
+import threading
+from recognition_backends import GoogleBackend, RecognitionBackend, RecognitionService
+from recognition_pipeline import SharedRecognitionPool
+from voice_listener import VoiceListener
+
+
+class ListenerHost:
+    """Runs many VoiceListeners in one process on a shared recognition pool.
+
+    Each source (a microphone, file, directory or PCM stream) gets its own
+    VoiceListener with its own trigger phrases, counters, email settings and
+    capture thread. Capture threads only read audio; recognition, the expensive
+    part, runs on one bounded pool of workers that serves the sources
+    round-robin, so one busy source cannot starve the others.
+
+    All listeners also share one RecognitionService (recognition_backend, or
+    Google by default), so there is one set of rate limits and circuit
+    breakers and one call executor rather than one per source.
+    """
+
+    def __init__(self, workers=4, queue_size=4, max_in_flight=None, recognition_backend=None):
+        self.pool = SharedRecognitionPool(workers=workers, queue_size=queue_size, max_in_flight=max_in_flight)
+        if recognition_backend is None:
+            recognition_backend = GoogleBackend()
+        if isinstance(recognition_backend, RecognitionBackend):
+            # Each pool worker makes one call at a time, two while hedging
+            recognition_backend = RecognitionService(recognition_backend, max_workers=2 * self.pool.workers)
+        self.recognition = recognition_backend
+        self.listeners = {}
+        self._lock = threading.Lock()
+        self._duration_mins = None  # set while the host is running
+
+    def add_source(self, name, audio_source=None, **listener_kwargs):
+        """Create a listener for a source; listener_kwargs are passed to VoiceListener.
+
+        Sources added while the host is running start listening immediately.
+        """
+        with self._lock:
+            if name in self.listeners:
+                raise ValueError(f"Source '{name}' already exists")
+            listener_kwargs.setdefault("recognition_backend", self.recognition)
+            listener = VoiceListener(audio_source=audio_source, recognition_pool=self.pool, name=name,
+                                     **listener_kwargs)
+            self.listeners[name] = listener
+            duration_mins = self._duration_mins
+        if duration_mins is not None:
+            listener.start_listening(duration_mins)
+        return listener
+
+    def remove_source(self, name):
+        with self._lock:
+            listener = self.listeners.pop(name, None)
+        if listener is None:
+            return False
+        listener.stop_listening()
+        return True
+
+    def start(self, duration_mins=60):
+        self.pool.start()
+        with self._lock:
+            self._duration_mins = duration_mins
+            listeners = list(self.listeners.values())
+        for listener in listeners:
+            listener.start_listening(duration_mins)
+
+    def stop(self):
+        with self._lock:
+            self._duration_mins = None
+            listeners = list(self.listeners.values())
+        # Stop capture everywhere first so the joins below run concurrently
+        for listener in listeners:
+            listener.request_stop()
+        for listener in listeners:
+            listener.stop_listening()
+        self.pool.stop()
+
+    def is_running(self):
+        with self._lock:
+            return any(listener.is_running() for listener in self.listeners.values())
+
+    def get_stats(self):
+        """Pool utilisation plus per-source recognition and trigger stats"""
+        with self._lock:
+            listeners = dict(self.listeners)
+
+        sources = {}
+        for name, listener in listeners.items():
+            stats = listener.pipeline.get_stats() if listener.pipeline else {}
+            stats.update({
+                "running": listener.is_running(),
+                "trigger_count": listener.get_trigger_count(),
+                "trigger_threshold": listener.trigger_count,
+                "email_sent": listener.email_sent,
+            })
+            sources[name] = stats
+
+        pool = self.pool.get_stats()
+        return {"workers": pool["workers"], "busy": pool["busy"], "queued": pool["queued"], "sources": sources}
@@ -0,0 +1,232 @@
+import base64
+import hashlib
+import mimetypes
+import smtplib
+import os
+import threading
+import uuid
+import logging
+from collections import OrderedDict
+from email.message import Message
+from email.mime.audio import MIMEAudio
+from email.mime.base import MIMEBase
+from email.mime.text import MIMEText
+from email.utils import formatdate, make_msgid
+
+logger = logging.getLogger(__name__)
+
+
+class MessageTemplateCache:
+    """LRU cache of pre-encoded MIME message bodies.
+
+    The body part and the base64-encoded attachment are flattened once and kept
+    as strings. Rendering a message only builds the per-send headers (From, To,
+    Cc, Subject, Date, Message-ID) and prepends them to the cached multipart body.
+    Attachments are keyed by path, mtime and size, so editing the file on disk
+    invalidates them.
+
+    Attachments larger than stream_threshold bytes are never held in memory:
+    only their part headers are cached, and iter_data() base64-encodes the file
+    chunk by chunk while the message is written to the SMTP socket.
+    """
+
+    # 57 input bytes encode to one 76 character base64 line
+    STREAM_CHUNK_SIZE = 57 * 1024
+
+    def __init__(self, max_templates=32, max_attachments=8, stream_threshold=1024 * 1024):
+        self.max_templates = max_templates
+        self.max_attachments = max_attachments
+        self.stream_threshold = stream_threshold
+
+        self._lock = threading.Lock()
+        self._templates = OrderedDict()    # (body hash, html, attachment key) -> (content type, payload)
+        self._attachments = OrderedDict()  # (path, mtime, size) -> flattened part or None
+
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, sender, subject, to_emails, cc_emails, body, html_content, attachment_path):
+        """Return the complete message as a string, ready for sendmail"""
+        content_type, segments = self.template(body, html_content, attachment_path)
+        headers = self._headers(sender, subject, to_emails, cc_emails, content_type)
+        return headers + "".join(
+            segment if isinstance(segment, str) else segment.encode_all() for segment in segments
+        )
+
+    def iter_data(self, sender, subject, to_emails, cc_emails, body, html_content, attachment_path):
+        """Yield the message as CRLF-terminated, dot-stuffed bytes for an SMTP DATA command.
+
+        Streamed attachments are read and base64-encoded a chunk at a time, so peak
+        memory does not depend on the attachment size.
+        """
+        content_type, segments = self.template(body, html_content, attachment_path)
+        yield smtplib.quotedata(self._headers(sender, subject, to_emails, cc_emails, content_type)).encode("utf-8")
+        for segment in segments:
+            if isinstance(segment, str):
+                yield smtplib.quotedata(segment).encode("utf-8")
+            else:
+                # base64 lines never start with ".", so only line endings need converting
+                for chunk in segment.iter_encoded(self.STREAM_CHUNK_SIZE):
+                    yield chunk.replace(b"\n", b"\r\n")
+
+    def is_streamed(self, attachment_path):
+        """True if the attachment is large enough to be streamed from disk"""
+        key = self._attachment_key(attachment_path)
+        return key is not None and key[2] > self.stream_threshold and self._is_audio(key[0])
+
+    @staticmethod
+    def _headers(sender, subject, to_emails, cc_emails, content_type):
+        headers = Message()
+        headers['From'] = sender
+        headers['To'] = ", ".join(to_emails)
+        if cc_emails:
+            headers['Cc'] = ", ".join(cc_emails)
+        headers['Subject'] = subject
+        headers['Date'] = formatdate(localtime=True)
+        headers['Message-ID'] = make_msgid()
+        headers['MIME-Version'] = '1.0'
+
+        # Content-Type is appended by hand: setting a multipart type on the header-only
+        # Message would make the generator emit an empty multipart body of its own
+        return headers.as_string().rstrip("\n") + f"\nContent-Type: {content_type}\n\n"
+
+    def template(self, body, html_content, attachment_path):
+        """Return (Content-Type header, payload segments) for a body and attachment.
+
+        Segments are encoded strings, plus a _StreamedFile for a streamed attachment.
+        """
+        attachment_key = self._attachment_key(attachment_path)
+        key = (hashlib.sha256(body.encode("utf-8")).hexdigest(), bool(html_content), attachment_key)
+
+        with self._lock:
+            cached = self._templates.get(key)
+            if cached is not None:
+                self._templates.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        parts = [MIMEText(body, 'html' if html_content else 'plain').as_string()]
+        attachment = self._attachment_part(attachment_key)
+        streamed = None
+        if isinstance(attachment, _StreamedFile):
+            streamed = attachment
+            parts.append(attachment.headers)
+        elif attachment:
+            parts.append(attachment)
+
+        boundary = self._boundary(parts)
+        payload = "".join(f"--{boundary}\n{part}\n" for part in parts)
+        if streamed:
+            # The streamed part's headers end the text; its encoded data follows
+            segments = (payload, streamed, f"\n--{boundary}--\n")
+        else:
+            segments = (payload + f"--{boundary}--\n",)
+        cached = (f'multipart/mixed; boundary="{boundary}"', segments)
+
+        with self._lock:
+            self._templates[key] = cached
+            while len(self._templates) > self.max_templates:
+                self._templates.popitem(last=False)
+        return cached
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+            self._attachments.clear()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "templates": len(self._templates),
+                "attachments": len(self._attachments),
+            }
+
+    @staticmethod
+    def _attachment_key(attachment_path):
+        if not attachment_path or not os.path.exists(attachment_path):
+            return None
+        stat = os.stat(attachment_path)
+        return (os.path.abspath(attachment_path), stat.st_mtime_ns, stat.st_size)
+
+    def _attachment_part(self, attachment_key):
+        """Flattened, base64-encoded attachment part, a _StreamedFile for large files,
+        or None for non-audio files"""
+        if attachment_key is None:
+            return None
+
+        with self._lock:
+            if attachment_key in self._attachments:
+                self._attachments.move_to_end(attachment_key)
+                return self._attachments[attachment_key]
+
+        attachment_path, _, size = attachment_key
+        part = None
+        try:
+            maintype, subtype = self._mime_type(attachment_path)
+            filename = os.path.basename(attachment_path)
+
+            if maintype == 'audio' and size > self.stream_threshold:
+                headers = MIMEBase(maintype, subtype)
+                headers['Content-Transfer-Encoding'] = 'base64'
+                headers.add_header('Content-Disposition', 'attachment', filename=filename)
+                part = _StreamedFile(attachment_path, headers.as_string().rstrip("\n") + "\n")
+                logger.info(f"Audio attachment {filename} ({size} bytes) will be streamed")
+            elif maintype == 'audio':
+                with open(attachment_path, 'rb') as fp:
+                    attachment = MIMEAudio(fp.read(), _subtype=subtype)
+
+                # Add header to make the attachment downloadable
+                attachment.add_header('Content-Disposition', 'attachment', filename=filename)
+                part = attachment.as_string()
+                logger.info(f"Encoded audio attachment: {filename}")
+        except Exception as e:
+            logger.error(f"Failed to attach audio file: {e}")
+            return None
+
+        with self._lock:
+            self._attachments[attachment_key] = part
+            while len(self._attachments) > self.max_attachments:
+                self._attachments.popitem(last=False)
+        return part
+
+    @staticmethod
+    def _mime_type(path):
+        # Determine MIME type
+        ctype, encoding = mimetypes.guess_type(path)
+        if ctype is None or encoding is not None:
+            ctype = 'application/octet-stream'
+        return ctype.split('/', 1)
+
+    @classmethod
+    def _is_audio(cls, path):
+        return cls._mime_type(path)[0] == 'audio'
+
+    @staticmethod
+    def _boundary(parts):
+        while True:
+            boundary = "=" * 15 + uuid.uuid4().hex
+            if not any(boundary in part for part in parts):
+                return boundary
+
+
+class _StreamedFile:
+    """Attachment part whose base64 body is produced from disk on demand"""
+
+    def __init__(self, path, headers):
+        self.path = path
+        self.headers = headers  # part headers followed by the blank separator line
+
+    def iter_encoded(self, chunk_size):
+        with open(self.path, 'rb') as fp:
+            while True:
+                data = fp.read(chunk_size)
+                if not data:
+                    break
+                yield base64.encodebytes(data)
+
+    def encode_all(self):
+        with open(self.path, 'rb') as fp:
+            return base64.encodebytes(fp.read()).decode("ascii")
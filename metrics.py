@@ -0,0 +1,213 @@
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds, from sub-millisecond matching up to slow SMTP handshakes
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+DESCRIPTIONS = {
+    "voice_stage_seconds": ("histogram", "Time spent in each listening pipeline stage"),
+    "voice_recognition_total": ("counter", "Recognition attempts by outcome"),
+    "voice_triggers_total": ("counter", "Trigger phrase detections"),
+    "smtp_connect_seconds": ("histogram", "SMTP connect, STARTTLS and login time"),
+    "smtp_send_seconds": ("histogram", "Time to transmit one message over an open session"),
+    "smtp_send_total": ("counter", "Messages sent by outcome"),
+}
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Timer:
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+class MetricsRegistry:
+    """Counters and latency histograms rendered in the Prometheus text format.
+
+    Recording is a no-op until enable() is called, so instrumented code pays
+    only an attribute check when metrics are off.
+    """
+
+    def __init__(self, enabled=False, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}    # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> _Histogram
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    def timer(self, name, **labels):
+        """Context manager that observes the elapsed time of its block"""
+        if not self.enabled:
+            return _NOOP_TIMER
+        return _Timer(self, name, labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, (list(h.counts), h.sum, h.count)) for key, h in self._histograms.items()
+            )
+
+        lines = []
+        described = set()
+
+        def describe(name, default_type):
+            if name in described:
+                return
+            described.add(name)
+            metric_type, description = DESCRIPTIONS.get(name, (default_type, name))
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for (name, labels), (counts, total, count) in histograms:
+            describe(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', repr(float(bound))),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """Atomically write the metrics to a file (e.g. for node_exporter's textfile collector)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+# Process-wide registry used by the instrumented modules
+registry = MetricsRegistry()
+
+_server = None
+_textfile_thread = None
+
+
+def enable():
+    registry.enabled = True
+
+
+def disable():
+    registry.enabled = False
+
+
+def start_http_server(port=9108, addr="127.0.0.1"):
+    """Serve the registry at http://addr:port/metrics on a background thread (once per process)"""
+    global _server
+    if _server is not None:
+        return _server
+
+    class _MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    _server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+    thread = threading.Thread(target=_server.serve_forever, name="metrics-http")
+    thread.daemon = True
+    thread.start()
+    return _server
+
+
+def start_textfile_writer(path, interval=15):
+    """Rewrite the metrics file every `interval` seconds on a background thread"""
+    global _textfile_thread
+    if _textfile_thread is not None:
+        return
+
+    def run():
+        while True:
+            try:
+                registry.write_textfile(path)
+            except Exception as e:
+                print(f"Error writing metrics file: {e}")
+            time.sleep(interval)
+
+    _textfile_thread = threading.Thread(target=run, name="metrics-textfile")
+    _textfile_thread.daemon = True
+    _textfile_thread.start()
@@ -0,0 +1,153 @@
+import json
+import math
+import os
+import threading
+import time
+import numpy as np
+import speech_recognition as sr
+
+
+class NoiseFloorTracker:
+    """Follows the ambient noise floor from every captured chunk and derives an energy threshold.
+
+    The floor falls quickly towards quieter chunks (fall_time seconds) and rises
+    slowly towards louder ones (rise_time), so it settles on the background
+    level between words. Chunks louder than speech_ratio times the floor are
+    taken to be speech and only nudge the floor over a much longer horizon
+    (loud_time), which still lets it adapt to a persistent change such as a fan
+    switching on. The threshold is ratio times the floor, never below
+    min_threshold.
+    """
+
+    def __init__(self, floor=None, ratio=1.5, min_threshold=50, fall_time=0.5, rise_time=15.0,
+                 loud_time=120.0, speech_ratio=3.0):
+        self.floor = floor
+        self.ratio = ratio
+        self.min_threshold = min_threshold
+        self.fall_time = fall_time
+        self.rise_time = rise_time
+        self.loud_time = loud_time
+        self.speech_ratio = speech_ratio
+        self.seconds_tracked = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def threshold(self):
+        if self.floor is None:
+            return None
+        return max(self.min_threshold, self.floor * self.ratio)
+
+    def update(self, energy, seconds):
+        """Fold one chunk's RMS energy (covering `seconds` of audio) into the floor"""
+        with self._lock:
+            self.seconds_tracked += seconds
+            if self.floor is None:
+                self.floor = float(energy)
+                return
+            if energy <= self.floor:
+                time_constant = self.fall_time
+            elif energy <= self.floor * self.speech_ratio:
+                time_constant = self.rise_time
+            else:
+                time_constant = self.loud_time
+            alpha = math.exp(-seconds / time_constant)
+            self.floor = self.floor * alpha + energy * (1 - alpha)
+
+    def get_stats(self):
+        return {"floor": self.floor, "threshold": self.threshold, "seconds_tracked": self.seconds_tracked}
+
+
+class TrackedStream:
+    """Wraps an audio source's stream so every chunk read also updates a NoiseFloorTracker.
+
+    The recognizer's energy_threshold follows the tracker, so listen() and the
+    VAD gate see the current threshold without a separate calibration pass.
+    """
+
+    def __init__(self, stream, tracker, sample_rate, sample_width, recognizer=None):
+        self.stream = stream
+        self.tracker = tracker
+        self.sample_rate = sample_rate
+        self.dtype = {1: np.uint8, 2: '<i2', 4: '<i4'}.get(sample_width)
+        self.sample_width = sample_width
+        self.recognizer = recognizer
+
+    def read(self, size):
+        data = self.stream.read(size)
+        if data and self.dtype is not None:
+            samples = np.frombuffer(data[:len(data) - len(data) % self.sample_width], dtype=self.dtype)
+            if len(samples):
+                samples = samples.astype(np.float64)
+                if self.sample_width == 1:
+                    samples -= 128  # 8-bit PCM (as in WAV) is unsigned, centred on 128
+                energy = float(np.sqrt(np.mean(samples ** 2)))
+                self.tracker.update(energy, len(samples) / float(self.sample_rate))
+                if self.recognizer is not None:
+                    self.recognizer.energy_threshold = self.tracker.threshold
+        return data
+
+    def __getattr__(self, name):
+        # close() and anything else the source expects from its own stream
+        return getattr(self.stream, name)
+
+
+class CalibrationStore:
+    """Noise calibration persisted per input device in a JSON file.
+
+    Entries older than max_age seconds are ignored, so a device that moved to
+    a different room is recalibrated eventually.
+    """
+
+    def __init__(self, path="data/calibration.json", max_age=7 * 24 * 3600):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self, device):
+        """Return the saved noise floor for device, or None"""
+        with self._lock:
+            entry = self._read().get(device)
+        if not entry or time.time() - entry.get("updated", 0) > self.max_age:
+            return None
+        return entry.get("floor")
+
+    def save(self, device, floor, threshold=None):
+        with self._lock:
+            data = self._read()
+            data[device] = {"floor": floor, "threshold": threshold, "updated": time.time()}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def device_key(source):
+    """Stable name for a microphone (device name and sample rate); None for other sources"""
+    if not isinstance(source, sr.Microphone):
+        return None
+    name = None
+    try:
+        audio = source.pyaudio_module.PyAudio()
+        try:
+            if source.device_index is None:
+                info = audio.get_default_input_device_info()
+            else:
+                info = audio.get_device_info_by_index(source.device_index)
+            name = info.get("name")
+        finally:
+            audio.terminate()
+    except Exception:
+        pass
+    if name is None:
+        name = "default" if source.device_index is None else f"device-{source.device_index}"
+    return f"mic:{name}:{source.SAMPLE_RATE}"
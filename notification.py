@@ -1,40 +1,106 @@
+import io
 import wave
 import numpy as np
 import os
+from functools import lru_cache
 
-def create_notification_sound(filename="data/audio/notification.wav"):
-    """Create a default notification sound file"""
-    os.makedirs(os.path.dirname(filename), exist_ok=True)
-    
-    # Audio parameters
-    duration = 0.5  # seconds
-    sample_rate = 44100  # Hz
-    frequency = 800  # Hz
+def _segment(spec, sample_rate):
+    """Render one tone segment: (freq, duration) for a steady tone,
+    (start_freq, end_freq, duration) for a linear chirp, or (0, duration) for silence"""
+    if len(spec) == 2:
+        start_freq, duration = spec
+        end_freq = start_freq
+    else:
+        start_freq, end_freq, duration = spec
     
-    # Generate a simple beep
-    t = np.linspace(0, duration, int(sample_rate * duration), False)
-    tone = np.sin(2 * np.pi * frequency * t) * 0.5
+    t = np.arange(int(sample_rate * duration)) / sample_rate
+    if start_freq == 0 and end_freq == 0:
+        return np.zeros_like(t)
     
-    # Add a fade in/out
-    fade_samples = int(sample_rate * 0.05)
-    fade_in = np.linspace(0, 1, fade_samples)
-    fade_out = np.linspace(1, 0, fade_samples)
+    # Integrate the instantaneous frequency so chirps stay phase-continuous
+    sweep = (end_freq - start_freq) / (2 * duration) if duration else 0
+    return np.sin(2 * np.pi * (start_freq * t + sweep * t ** 2))
+
+def _envelope(length, sample_rate, attack, release):
+    """Linear attack/release envelope (fade in/out)"""
+    envelope = np.ones(length)
+    attack_samples = min(int(sample_rate * attack), length)
+    release_samples = min(int(sample_rate * release), length - attack_samples)
+    if attack_samples:
+        envelope[:attack_samples] = np.linspace(0, 1, attack_samples)
+    if release_samples:
+        envelope[-release_samples:] = np.linspace(1, 0, release_samples)
+    return envelope
+
+def _freeze(tones):
+    """tones as nested tuples, so lists from callers or JSON can key the caches"""
+    return tuple(tuple(spec) for spec in tones)
+
+def synthesize(tones=((800, 0.5),), sample_rate=44100, amplitude=0.5, attack=0.05,
+               release=0.05, repeat=1, gap=0.1):
+    """Generate a 16-bit mono tone pattern as a NumPy array.
+
+    tones is a sequence of segments played back to back, each (freq, duration),
+    (start_freq, end_freq, duration) for a chirp, or (0, duration) for a pause.
+    Every segment gets its own attack/release envelope, and the whole pattern is
+    repeated `repeat` times with `gap` seconds of silence in between.
+
+    Results are memoized by their parameters, so the returned array is read-only.
+    """
+    return _synthesize(_freeze(tones), sample_rate, amplitude, attack, release, repeat, gap)
+
+@lru_cache(maxsize=64)
+def _synthesize(tones, sample_rate, amplitude, attack, release, repeat, gap):
+    segments = []
+    for spec in tones:
+        segment = _segment(spec, sample_rate)
+        segments.append(segment * _envelope(len(segment), sample_rate, attack, release))
+    pattern = np.concatenate(segments) if segments else np.zeros(0)
     
-    tone[:fade_samples] *= fade_in
-    tone[-fade_samples:] *= fade_out
+    if repeat > 1:
+        silence = np.zeros(int(sample_rate * gap))
+        pattern = np.concatenate([pattern, silence] * (repeat - 1) + [pattern])
     
     # Convert to 16-bit PCM
-    tone = (tone * 32767).astype(np.int16)
-    
-    # Save as a WAV file
-    with wave.open(filename, 'w') as wf:
+    pcm = (np.clip(pattern * amplitude, -1, 1) * 32767).astype(np.int16)
+    pcm.setflags(write=False)
+    return pcm
+
+def to_wav_bytes(samples, sample_rate=44100):
+    """Encode 16-bit mono samples as an in-memory WAV file"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wf:
         wf.setnchannels(1)
         wf.setsampwidth(2)
         wf.setframerate(sample_rate)
-        wf.writeframes(tone.tobytes())
+        wf.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+def get_notification_sound(tones=((800, 0.5),), sample_rate=44100, **kwargs):
+    """WAV bytes for a synthesized sound, e.g. for st.audio or an email attachment"""
+    return _notification_sound(_freeze(tones), sample_rate, **kwargs)
+
+@lru_cache(maxsize=32)
+def _notification_sound(tones, sample_rate, **kwargs):
+    return to_wav_bytes(synthesize(tones, sample_rate, **kwargs), sample_rate)
+
+def create_notification_sound(filename="data/audio/notification.wav", **kwargs):
+    """Create a default notification sound file"""
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    data = get_notification_sound(**kwargs)
+    
+    # Rewriting identical bytes would change the mtime and invalidate cached attachments
+    if os.path.exists(filename):
+        with open(filename, 'rb') as f:
+            if f.read() == data:
+                return filename
+    
+    # Save as a WAV file
+    with open(filename, 'wb') as f:
+        f.write(data)
     
     return filename
 
 if __name__ == "__main__":
     filename = create_notification_sound()
-    print(f"Created notification sound: {filename}")
\ No newline at end of file
+    print(f"Created notification sound: {filename}")
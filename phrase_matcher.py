@@ -0,0 +1,125 @@
+import threading
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+
+class PhraseMatcher:
+    """Aho-Corasick automaton for matching many trigger phrases in one pass.
+
+    Phrases match case-insensitively and only on word boundaries, mirroring the
+    r'\\b<phrase>\\b' regexes it replaces. Phrases can be added or removed at any
+    time; the automaton is recompiled lazily on the next scan and swapped in
+    atomically, so scans running on other threads are never disturbed.
+    """
+
+    def __init__(self, phrases=None):
+        self._lock = threading.Lock()
+        self._phrases = []
+        self._automaton = None
+        for phrase in phrases or []:
+            self.add_phrase(phrase)
+
+    @property
+    def phrases(self):
+        return list(self._phrases)
+
+    def __len__(self):
+        return len(self._phrases)
+
+    def __contains__(self, phrase):
+        return phrase.lower().strip() in self._phrases
+
+    def add_phrase(self, phrase):
+        """Add a phrase. Returns False if it is empty or already present."""
+        phrase = phrase.lower().strip()
+        with self._lock:
+            if not phrase or phrase in self._phrases:
+                return False
+            self._phrases.append(phrase)
+            self._automaton = None
+        return True
+
+    def remove_phrase(self, phrase):
+        """Remove a phrase. Returns False if it was not present."""
+        phrase = phrase.lower().strip()
+        with self._lock:
+            if phrase not in self._phrases:
+                return False
+            self._phrases.remove(phrase)
+            self._automaton = None
+        return True
+
+    def finditer(self, text):
+        """Yield (start, end, phrase) for every word-bounded match in text"""
+        goto, fail, out = self._compiled()
+        text = text.lower()
+        length = len(text)
+        state = 0
+
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+
+            for phrase in out[state]:
+                start = i - len(phrase) + 1
+                end = i + 1
+                before = text[start - 1] if start > 0 else " "
+                after = text[end] if end < length else " "
+                if (_is_word_char(before) != _is_word_char(phrase[0])
+                        and _is_word_char(after) != _is_word_char(phrase[-1])):
+                    yield start, end, phrase
+
+    def find_all(self, text):
+        """Return every distinct phrase found in text, in order of first occurrence"""
+        found = []
+        for _, _, phrase in self.finditer(text):
+            if phrase not in found:
+                found.append(phrase)
+        return found
+
+    def _compiled(self):
+        automaton = self._automaton
+        if automaton is None:
+            with self._lock:
+                if self._automaton is None:
+                    self._automaton = self._build(self._phrases)
+                automaton = self._automaton
+        return automaton
+
+    @staticmethod
+    def _build(phrases):
+        goto = [{}]
+        out = [[]]
+
+        # Trie of all phrases
+        for phrase in phrases:
+            state = 0
+            for ch in phrase:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            out[state].append(phrase)
+
+        # Failure links, breadth first so shorter suffixes are resolved first
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+
+        return goto, fail, out
@@ -0,0 +1,181 @@
+import collections
+import queue
+import threading
+import wave
+import numpy as np
+
+# Conditionally import audio playback libraries
+try:
+    import pyaudio
+    AUDIO_PLAYBACK_AVAILABLE = True
+except ImportError:
+    AUDIO_PLAYBACK_AVAILABLE = False
+
+
+def load_wav_samples(path):
+    """Decode a WAV file into an int16 NumPy array of shape (frames, channels)"""
+    with wave.open(path, 'rb') as wf:
+        channels = wf.getnchannels()
+        width = wf.getsampwidth()
+        rate = wf.getframerate()
+        frames = wf.readframes(wf.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.int16) - 128) << 8
+    elif width == 2:
+        samples = np.frombuffer(frames, dtype='<i2')
+    elif width == 3:
+        # Keep the two most significant bytes of each little-endian 24-bit sample
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        samples = (raw[:, 1].astype(np.uint16) | (raw[:, 2].astype(np.uint16) << 8)).view(np.int16)
+    elif width == 4:
+        samples = (np.frombuffer(frames, dtype='<i4') >> 16).astype(np.int16)
+    else:
+        raise ValueError(f"Unsupported sample width: {width}")
+
+    return samples.reshape(-1, channels), rate
+
+
+class PlaybackEngine:
+    """Plays a preloaded response sound on its own thread without blocking the caller.
+
+    The sound is decoded into memory once and a single output stream stays open
+    for the engine's lifetime. play() only enqueues a request; what happens when
+    a trigger arrives while the sound is still playing is set by policy:
+
+    - "overlap": mix the new playback on top of the ones already running
+    - "cancel":  stop the current playback and start again from the beginning
+    - "queue":   play after the current playback finishes (up to max_queue pending)
+    - "drop":    ignore the request
+    """
+
+    POLICIES = ("overlap", "cancel", "queue", "drop")
+
+    def __init__(self, audio_path, policy="cancel", max_queue=4, chunk_frames=1024, max_voices=4):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unsupported playback policy: {policy}")
+
+        self.audio_path = audio_path
+        self.policy = policy
+        self.max_queue = max_queue
+        self.chunk_frames = chunk_frames
+        self.max_voices = max_voices
+
+        self.samples, self.rate = load_wav_samples(audio_path)
+        self.channels = self.samples.shape[1]
+
+        self._requests = queue.Queue()
+        self._pending = collections.deque()
+        self._voices = []  # frame offsets of sounds currently playing
+        self._running = False
+        self._thread = None
+        self._pyaudio = None
+        self._stream = None
+
+        self.played = 0
+        self.dropped = 0
+
+    def start(self):
+        if self._running:
+            return
+        if not AUDIO_PLAYBACK_AVAILABLE:
+            raise RuntimeError("Audio playback libraries not available")
+
+        self._pyaudio = pyaudio.PyAudio()
+        self._stream = self._pyaudio.open(format=pyaudio.paInt16, channels=self.channels,
+                                          rate=self.rate, output=True,
+                                          frames_per_buffer=self.chunk_frames)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="playback")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def play(self):
+        """Request playback; returns immediately"""
+        if self._running:
+            self._requests.put("play")
+
+    def cancel(self):
+        """Stop anything playing or waiting to play"""
+        if self._running:
+            self._requests.put("cancel")
+
+    def is_playing(self):
+        return bool(self._voices or self._pending)
+
+    def stop(self, timeout=2):
+        self._running = False
+        self._requests.put("stop")
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._pyaudio is not None:
+            self._pyaudio.terminate()
+            self._pyaudio = None
+
+    def get_stats(self):
+        return {"played": self.played, "dropped": self.dropped, "playing": len(self._voices),
+                "pending": len(self._pending)}
+
+    def _handle(self, request):
+        if request == "cancel":
+            self._voices = []
+            self._pending.clear()
+            return
+        if request != "play":
+            return
+
+        if not self._voices:
+            self._voices.append(0)
+        elif self.policy == "overlap" and len(self._voices) < self.max_voices:
+            self._voices.append(0)
+        elif self.policy == "cancel":
+            self._voices = [0]
+        elif self.policy == "queue" and len(self._pending) < self.max_queue:
+            self._pending.append(0)
+        else:
+            self.dropped += 1
+            return
+        self.played += 1
+
+    def _next_chunk(self):
+        """Mix the next chunk of every active voice and advance their offsets"""
+        total = len(self.samples)
+        mix = np.zeros((self.chunk_frames, self.channels), dtype=np.int32)
+        longest = 0
+        remaining = []
+        for offset in self._voices:
+            part = self.samples[offset:offset + self.chunk_frames]
+            mix[:len(part)] += part
+            longest = max(longest, len(part))
+            if offset + self.chunk_frames < total:
+                remaining.append(offset + self.chunk_frames)
+
+        self._voices = remaining
+        if not self._voices and self._pending:
+            self._voices.append(self._pending.popleft())
+        return np.clip(mix[:longest], -32768, 32767).astype('<i2').tobytes()
+
+    def _run(self):
+        while self._running:
+            # Block while idle; poll between chunks while playing
+            try:
+                request = self._requests.get(timeout=None if not self._voices else 0)
+                self._handle(request)
+                while True:
+                    self._handle(self._requests.get_nowait())
+            except queue.Empty:
+                pass
+
+            if not self._running:
+                break
+            if self._voices:
+                try:
+                    self._stream.write(self._next_chunk())
+                except Exception as e:
+                    print(f"Error playing audio response: {e}")
+                    self._voices = []
+                    self._pending.clear()
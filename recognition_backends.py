@@ -0,0 +1,310 @@
+import collections
+import copy
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import speech_recognition as sr
+
+# Conditionally import the offline CMU Sphinx engine
+try:
+    import pocketsphinx  # noqa: F401
+    SPHINX_AVAILABLE = True
+except ImportError:
+    SPHINX_AVAILABLE = False
+
+
+class RecognitionBackend:
+    """A speech-to-text engine.
+
+    recognize() returns the transcript, raises sr.UnknownValueError when the
+    audio was understood to contain no speech, and sr.RequestError (or any
+    other exception) when the engine failed.
+    """
+
+    name = "backend"
+
+    def recognize(self, audio, timeout=None):
+        raise NotImplementedError
+
+
+class GoogleBackend(RecognitionBackend):
+    """Google Web Speech API through SpeechRecognition"""
+
+    name = "google"
+
+    def __init__(self, recognizer=None, key=None, language="en-US"):
+        self.recognizer = recognizer or sr.Recognizer()
+        self.key = key
+        self.language = language
+        self._local = threading.local()
+
+    def recognize(self, audio, timeout=None):
+        # The HTTP request honours the deadline via operation_timeout. Calls run
+        # concurrently, so each thread sets it on its own copy of the recognizer
+        recognizer = getattr(self._local, "recognizer", None)
+        if recognizer is None:
+            recognizer = self._local.recognizer = copy.copy(self.recognizer)
+        recognizer.operation_timeout = timeout
+        return recognizer.recognize_google(audio, key=self.key, language=self.language)
+
+
+class SphinxBackend(RecognitionBackend):
+    """Offline CMU Sphinx recognition (requires pocketsphinx)"""
+
+    name = "sphinx"
+
+    def __init__(self, recognizer=None, language="en-US", keywords=None):
+        if not SPHINX_AVAILABLE:
+            raise RuntimeError("pocketsphinx is not installed")
+        self.recognizer = recognizer or sr.Recognizer()
+        self.language = language
+        self.keywords = keywords  # optional [(phrase, sensitivity)] for keyword spotting
+
+    def recognize(self, audio, timeout=None):
+        return self.recognizer.recognize_sphinx(audio, language=self.language, keyword_entries=self.keywords)
+
+
+class CallableBackend(RecognitionBackend):
+    """Wraps any function(audio) -> text, e.g. a local engine or a test stand-in"""
+
+    def __init__(self, name, func):
+        self.name = name
+        self.func = func
+
+    def recognize(self, audio, timeout=None):
+        return self.func(audio)
+
+
+class TokenBucket:
+    """Allows `rate` calls per second on average with bursts of up to `burst`"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=0):
+        """Take a token, waiting up to timeout seconds; returns False if none became available"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait_time = (1 - self._tokens) / self.rate
+            if now + wait_time > deadline:
+                return False
+            time.sleep(wait_time)
+
+
+class CircuitBreaker:
+    """Stops calling a failing backend for a while.
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    are refused for reset_timeout seconds. Then a single trial call is let
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+class _BackendState:
+    """A backend with its rate limiter, circuit breaker and latency stats"""
+
+    def __init__(self, backend, rate_limit, burst, failure_threshold, reset_timeout):
+        self.backend = backend
+        self.name = backend.name
+        self.bucket = TokenBucket(rate_limit, burst) if rate_limit else None
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.latencies = collections.deque(maxlen=1000)
+        self.lock = threading.Lock()
+        self.counts = collections.Counter()
+
+    def count(self, outcome):
+        with self.lock:
+            self.counts[outcome] += 1
+
+    def get_stats(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            counts = dict(self.counts)
+        stats = {"state": self.breaker.state, "calls": counts.get("call", 0), "ok": counts.get("ok", 0),
+                 "unknown": counts.get("unknown", 0), "errors": counts.get("error", 0),
+                 "timeouts": counts.get("timeout", 0), "rate_limited": counts.get("rate_limited", 0),
+                 "circuit_open": counts.get("circuit_open", 0), "wins": counts.get("win", 0)}
+        if latencies:
+            stats["latency_avg"] = sum(latencies) / len(latencies)
+            stats["latency_p50"] = latencies[len(latencies) // 2]
+            stats["latency_p95"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return stats
+
+
+class RecognitionService:
+    """Recognizes clips through a primary backend with a deadline, rate limit and fallback.
+
+    Every call must finish within `deadline` seconds. Each backend has its own
+    token-bucket rate limit and circuit breaker. With a fallback backend:
+
+    - if the primary is rate limited, its circuit is open or it fails, the
+      fallback is asked instead
+    - with hedge_after set, the fallback is also asked when the primary has not
+      answered after hedge_after seconds, and the first answer wins
+
+    recognize() raises sr.UnknownValueError if the winning backend heard no
+    speech and sr.RequestError if no backend answered in time.
+    """
+
+    def __init__(self, primary, fallback=None, deadline=10.0, hedge_after=None, rate_limit=None,
+                 burst=None, fallback_rate_limit=None, failure_threshold=5, reset_timeout=30,
+                 max_workers=8):
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self.primary = _BackendState(primary, rate_limit, burst, failure_threshold, reset_timeout)
+        self.fallback = None
+        if fallback is not None:
+            self.fallback = _BackendState(fallback, fallback_rate_limit, None, failure_threshold, reset_timeout)
+        # Calls run on this pool so a stuck request cannot hold up the caller past its deadline
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="recognition")
+
+    def recognize(self, audio):
+        started = time.monotonic()
+        deadline = started + self.deadline
+        futures = {}
+        errors = []
+
+        # Without a fallback it is better to wait for a token than to give up
+        primary_wait = 0 if self.fallback else self.deadline
+        future = self._start(self.primary, audio, deadline, primary_wait, errors)
+        if future:
+            futures[future] = self.primary
+        if not futures and self.fallback:
+            future = self._start(self.fallback, audio, deadline, 0, errors)
+            if future:
+                futures[future] = self.fallback
+
+        hedged = not self.fallback or self.fallback in futures.values()
+        while futures:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            timeout = deadline - now
+            if not hedged and self.hedge_after is not None:
+                timeout = min(timeout, max(0, started + self.hedge_after - now))
+
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                state = futures.pop(future)
+                outcome, value = future.result()
+                if outcome in ("ok", "unknown"):
+                    state.count("win")
+                    if outcome == "unknown":
+                        raise sr.UnknownValueError()
+                    return value
+                if outcome == "late":
+                    state.count("timeout")
+                    state.breaker.record_failure()
+                    errors.append(f"{state.name}: answered after the deadline")
+                else:
+                    errors.append(f"{state.name}: {value}")
+
+            # Hedge when the primary is slow, or fall back when it failed
+            if not hedged and (not futures or (self.hedge_after is not None
+                                               and time.monotonic() - started >= self.hedge_after)):
+                hedged = True
+                future = self._start(self.fallback, audio, deadline, 0, errors)
+                if future:
+                    futures[future] = self.fallback
+
+        for state in futures.values():
+            state.count("timeout")
+            state.breaker.record_failure()
+            errors.append(f"{state.name}: no answer within {self.deadline:g}s")
+        raise sr.RequestError("; ".join(errors) or "no recognition backend available")
+
+    def _start(self, state, audio, deadline, token_wait, errors):
+        if not state.breaker.allow():
+            state.count("circuit_open")
+            errors.append(f"{state.name}: circuit open")
+            return None
+        if state.bucket and not state.bucket.acquire(timeout=min(token_wait, max(0, deadline - time.monotonic()))):
+            state.count("rate_limited")
+            errors.append(f"{state.name}: rate limited")
+            return None
+        state.count("call")
+        return self._executor.submit(self._call, state, audio, deadline)
+
+    @staticmethod
+    def _call(state, audio, deadline):
+        started = time.monotonic()
+        try:
+            text = state.backend.recognize(audio, timeout=max(0.1, deadline - started))
+            outcome, value = "ok", text
+        except sr.UnknownValueError:
+            outcome, value = "unknown", None
+        except Exception as e:
+            outcome, value = "error", e
+
+        elapsed = time.monotonic() - started
+        if time.monotonic() > deadline:
+            # Answered or failed too late to matter; the caller counts this once as a timeout
+            return "late", None
+
+        with state.lock:
+            state.latencies.append(elapsed)
+        state.count(outcome)
+        if outcome == "error":
+            state.breaker.record_failure()
+        else:
+            state.breaker.record_success()
+        return outcome, value
+
+    def get_stats(self):
+        stats = {self.primary.name: self.primary.get_stats()}
+        if self.fallback:
+            stats[self.fallback.name] = self.fallback.get_stats()
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,373 @@
+import collections
+import queue
+import threading
+import time
+
+# Marker for sequence numbers that were dropped from a queue
+_DROPPED = object()
+
+
+class _InOrderDelivery:
+    """Hands results to on_result in sequence order, one at a time.
+
+    Whichever worker completes the next expected sequence number delivers it,
+    and keeps delivering results that become ready meanwhile; other threads
+    only record theirs. on_result therefore runs serialized and in order, but
+    outside the lock, so a slow callback never blocks workers recording results.
+    Dropped sequence numbers are recorded without delivering anything, which
+    keeps callbacks off the capture thread.
+    """
+
+    def __init__(self, on_result, name=None):
+        self.on_result = on_result
+        self.name = name
+        self.processed = 0
+        self._lock = threading.Lock()
+        self._next = 0
+        self._pending = {}
+        self._delivering = False
+
+    def drop(self, seq):
+        with self._lock:
+            self._pending[seq] = _DROPPED
+
+    def complete(self, seq, result):
+        with self._lock:
+            self._pending[seq] = result
+            if self._delivering:
+                return
+            self._delivering = True
+        while True:
+            with self._lock:
+                ready = _DROPPED
+                while ready is _DROPPED and self._next in self._pending:
+                    ready = self._pending.pop(self._next)
+                    self._next += 1
+                if ready is _DROPPED:
+                    self._delivering = False
+                    return
+                self.processed += 1
+            if ready is not None:
+                try:
+                    self.on_result(ready)
+                except Exception as e:
+                    suffix = f" for {self.name}" if self.name else ""
+                    print(f"Error handling recognition result{suffix}: {e}")
+
+
+class RecognitionPipeline:
+    """Producer/consumer pipeline that recognizes captured clips on a pool of worker threads.
+
+    The capture thread calls submit() with each clip. Workers run the recognize
+    callable and results are handed to on_result strictly in submission order,
+    one at a time, so trigger counting sees transcripts in the order they were
+    spoken. submitted counts every clip offered while running; each one ends up
+    dropped, processed, or still queued or in flight.
+    """
+
+    DROP_POLICIES = ("block", "drop_newest", "drop_oldest")
+
+    def __init__(self, recognize, on_result, workers=2, queue_size=4, drop_policy="block"):
+        if drop_policy not in self.DROP_POLICIES:
+            raise ValueError(f"Unsupported drop policy: {drop_policy}")
+
+        self.recognize = recognize
+        self.on_result = on_result
+        self.workers = max(1, int(workers))
+        self.drop_policy = drop_policy
+
+        self._queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._threads = []
+        self._running = False
+
+        # Sequencing state for in-order delivery
+        self._submit_lock = threading.Lock()
+        self._next_seq = 0
+        self._delivery = _InOrderDelivery(on_result)
+
+        self.submitted = 0
+        self.dropped = 0
+
+    @property
+    def processed(self):
+        return self._delivery.processed
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"recognizer-{i}")
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=2):
+        """Stop accepting clips and wait briefly for workers to drain"""
+        self._running = False
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def submit(self, clip):
+        """Queue a clip for recognition. Returns False if the clip was dropped."""
+        if not self._running:
+            return False
+
+        with self._submit_lock:
+            seq = self._next_seq
+            if self.drop_policy == "block":
+                # Block until there is room, but give up once the pipeline stops
+                while True:
+                    try:
+                        self._queue.put((seq, clip), timeout=0.1)
+                        break
+                    except queue.Full:
+                        if not self._running:
+                            return False
+                self._next_seq += 1
+                self.submitted += 1
+                return True
+
+            self.submitted += 1
+            if self._queue.full():
+                if self.drop_policy == "drop_newest":
+                    self.dropped += 1
+                    return False
+                # drop_oldest: discard the head of the queue to make room
+                try:
+                    dropped_seq, _ = self._queue.get_nowait()
+                    self._queue.task_done()
+                    self.dropped += 1
+                    self._delivery.drop(dropped_seq)
+                except queue.Empty:
+                    pass
+            self._next_seq += 1
+            self._queue.put_nowait((seq, clip))
+        return True
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def get_stats(self):
+        return {
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "processed": self.processed,
+            "queued": self._queue.qsize(),
+        }
+
+    def _worker(self):
+        while self._running or not self._queue.empty():
+            try:
+                seq, clip = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            try:
+                result = self.recognize(clip)
+            except Exception as e:
+                print(f"Error in recognition worker: {e}")
+                result = None
+            finally:
+                self._queue.task_done()
+
+            self._delivery.complete(seq, result)
+
+
+class _PoolChannel:
+    """One listener's view of a SharedRecognitionPool.
+
+    Mirrors the RecognitionPipeline interface used by VoiceListener (start,
+    submit, stop, qsize, get_stats). Clips queue per channel and results are
+    delivered in submission order; drop_policy decides what a full channel
+    does, as in RecognitionPipeline.
+    """
+
+    def __init__(self, pool, name, recognize, on_result, queue_size, drop_policy):
+        if drop_policy not in RecognitionPipeline.DROP_POLICIES:
+            raise ValueError(f"Unsupported drop policy: {drop_policy}")
+
+        self.pool = pool
+        self.name = name
+        self.recognize = recognize
+        self.on_result = on_result
+        self.queue_size = max(1, int(queue_size))
+        self.drop_policy = drop_policy
+
+        self._queue = collections.deque()  # (seq, clip, queued_at)
+        self._next_seq = 0
+        self._delivery = _InOrderDelivery(on_result, name)
+        self.in_flight = 0
+        self.closed = False
+
+        self.submitted = 0
+        self.dropped = 0
+        self.wait_time = 0.0       # total seconds clips spent queued
+        self.recognize_time = 0.0  # total seconds spent in recognize
+
+    @property
+    def processed(self):
+        return self._delivery.processed
+
+    def start(self):
+        self.pool.start()
+
+    def submit(self, clip):
+        """Queue a clip. Returns False if the clip was dropped."""
+        return self.pool._submit(self, clip)
+
+    def stop(self, timeout=2):
+        """Let queued clips finish (up to timeout), then detach from the pool"""
+        self.pool._close_channel(self, timeout)
+
+    def qsize(self):
+        return len(self._queue)
+
+    def get_stats(self):
+        done = max(1, self.processed)
+        return {
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "processed": self.processed,
+            "queued": len(self._queue),
+            "in_flight": self.in_flight,
+            "avg_wait": self.wait_time / done,
+            "avg_recognize": self.recognize_time / done,
+        }
+
+
+
+class SharedRecognitionPool:
+    """A fixed set of recognition workers shared by many listeners.
+
+    Each listener gets its own bounded channel from open_channel(). Workers
+    serve the channels round-robin, so a noisy source with a long backlog
+    cannot starve quiet ones, and max_in_flight optionally caps how many
+    workers a single channel may occupy at once.
+    """
+
+    def __init__(self, workers=4, queue_size=4, max_in_flight=None):
+        self.workers = max(1, int(workers))
+        self.queue_size = queue_size
+        self.max_in_flight = max_in_flight
+
+        self._cond = threading.Condition()
+        self._channels = []
+        self._cursor = 0
+        self._threads = []
+        self._running = False
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"shared-recognizer-{i}")
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=2):
+        """Stop the workers; clips still queued are abandoned"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def open_channel(self, name, recognize, on_result, queue_size=None, drop_policy="drop_oldest"):
+        channel = _PoolChannel(self, name, recognize, on_result,
+                               queue_size if queue_size is not None else self.queue_size, drop_policy)
+        with self._cond:
+            self._channels.append(channel)
+        return channel
+
+    def get_stats(self):
+        with self._cond:
+            channels = list(self._channels)
+        return {
+            "workers": self.workers,
+            "busy": sum(channel.in_flight for channel in channels),
+            "queued": sum(len(channel._queue) for channel in channels),
+            "channels": {channel.name: channel.get_stats() for channel in channels},
+        }
+
+    def _submit(self, channel, clip):
+        with self._cond:
+            if channel.drop_policy == "block":
+                # Wait for room, but give up once the channel or pool shuts down
+                self._cond.wait_for(lambda: len(channel._queue) < channel.queue_size
+                                    or channel.closed or not self._running)
+            if channel.closed or not self._running:
+                return False
+            channel.submitted += 1
+            if len(channel._queue) >= channel.queue_size:
+                if channel.drop_policy == "drop_newest":
+                    channel.dropped += 1
+                    return False
+                # drop_oldest: discard the head of the queue to make room
+                dropped_seq, _, _ = channel._queue.popleft()
+                channel.dropped += 1
+                channel._delivery.drop(dropped_seq)
+            seq = channel._next_seq
+            channel._next_seq += 1
+            channel._queue.append((seq, clip, time.time()))
+            self._cond.notify_all()
+        return True
+
+    def _close_channel(self, channel, timeout):
+        with self._cond:
+            channel.closed = True
+            self._cond.notify_all()
+            if self._running:
+                self._cond.wait_for(lambda: not channel._queue and not channel.in_flight, timeout)
+            abandoned = list(channel._queue)
+            channel._queue.clear()
+            if channel in self._channels:
+                self._channels.remove(channel)
+        for seq, _, _ in abandoned:
+            channel._delivery.drop(seq)
+
+    def _take(self):
+        """Pop the next clip in round-robin order across channels (call with the lock held)"""
+        count = len(self._channels)
+        for i in range(count):
+            index = (self._cursor + i) % count
+            channel = self._channels[index]
+            if not channel._queue:
+                continue
+            if self.max_in_flight and channel.in_flight >= self.max_in_flight:
+                continue
+            self._cursor = (index + 1) % count
+            channel.in_flight += 1
+            self._cond.notify_all()  # wake submitters blocked on a full channel
+            return channel, channel._queue.popleft()
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._take() if self._running else None
+                while job is None and self._running:
+                    self._cond.wait(timeout=0.5)
+                    job = self._take()
+                if job is None:
+                    return
+
+            channel, (seq, clip, queued_at) = job
+            started = time.time()
+            channel.wait_time += started - queued_at
+            try:
+                result = channel.recognize(clip)
+            except Exception as e:
+                print(f"Error in recognition worker for {channel.name}: {e}")
+                result = None
+            channel.recognize_time += time.time() - started
+
+            channel._delivery.complete(seq, result)
+            with self._cond:
+                channel.in_flight -= 1
+                self._cond.notify_all()
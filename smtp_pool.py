@@ -0,0 +1,222 @@
+import smtplib
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from metrics import registry as metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPConnectionPool:
+    """Pool of authenticated SMTP sessions keyed by (server, port, sender).
+
+    Sessions are reused across sends instead of repeating the TCP connect,
+    STARTTLS and login handshake each time. Idle sessions are probed with NOOP
+    before reuse and replaced when the server has dropped them.
+    """
+
+    def __init__(self, max_per_server=2, idle_timeout=300, noop_interval=30, timeout=30, starttls=True):
+        self.max_per_server = max_per_server
+        self.idle_timeout = idle_timeout  # close sessions idle longer than this
+        self.noop_interval = noop_interval  # probe sessions idle longer than this
+        self.timeout = timeout
+        self.starttls = starttls  # False only for plaintext local servers (e.g. benchmarks)
+
+        self._cond = threading.Condition()
+        self._idle = {}   # key -> list of (smtp, last_used)
+        self._open = {}   # key -> number of open sessions (idle + in use)
+
+        self._keepalive_thread = None
+
+        self.connects = 0
+        self.reuses = 0
+
+    @contextmanager
+    def connection(self, server, port, sender, password):
+        """Check out a logged-in session; it is returned to the pool on success"""
+        key = (server, port, sender)
+        smtp = self.acquire(key, password)
+        try:
+            yield smtp
+        except smtplib.SMTPServerDisconnected:
+            self.discard(key, smtp)
+            raise
+        except OSError as e:
+            # SMTPException derives from OSError; only socket-level errors kill the session
+            if not isinstance(e, smtplib.SMTPException):
+                self.discard(key, smtp)
+                raise
+            self._reset_or_discard(key, smtp)
+            raise
+        except Exception:
+            self._reset_or_discard(key, smtp)
+            raise
+        else:
+            self.release(key, smtp)
+
+    def _reset_or_discard(self, key, smtp):
+        # Protocol-level errors (rejected recipient etc.) leave the session usable,
+        # but reset it so the next message starts from a clean state
+        try:
+            smtp.rset()
+        except Exception:
+            self.discard(key, smtp)
+            return
+        self.release(key, smtp)
+
+    def acquire(self, key, password):
+        deadline = time.time() + self.timeout
+        while True:
+            with self._cond:
+                smtp, idle_for = self._pop_idle(key)
+                while smtp is None:
+                    if self._open.get(key, 0) < self.max_per_server:
+                        self._open[key] = self._open.get(key, 0) + 1
+                        break
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No SMTP connection available for {key[0]}:{key[1]}")
+                    self._cond.wait(remaining)
+                    smtp, idle_for = self._pop_idle(key)
+
+            if smtp is None:
+                break
+
+            # Probe sessions that sat idle for a while; the server may have dropped them
+            if idle_for > self.noop_interval and not self._alive(smtp):
+                logger.info(f"Dropping stale SMTP session to {key[0]}:{key[1]}")
+                self.discard(key, smtp)
+                continue
+
+            self.reuses += 1
+            return smtp
+
+        # Connect outside the lock so other servers are not held up by the handshake
+        try:
+            smtp = self._connect(key, password)
+        except Exception:
+            with self._cond:
+                self._open[key] -= 1
+                self._cond.notify()
+            raise
+        return smtp
+
+    def release(self, key, smtp):
+        with self._cond:
+            self._idle.setdefault(key, []).append((smtp, time.time()))
+            self._cond.notify()
+
+    def discard(self, key, smtp):
+        self._close(smtp)
+        with self._cond:
+            self._open[key] = max(0, self._open.get(key, 0) - 1)
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, {}
+            for key, sessions in idle.items():
+                self._open[key] = max(0, self._open.get(key, 0) - len(sessions))
+            self._cond.notify_all()
+        for sessions in idle.values():
+            for smtp, _ in sessions:
+                self._close(smtp, quit=True)
+
+    def keepalive(self):
+        """NOOP every idle session that has not been used recently, dropping the dead ones"""
+        with self._cond:
+            due = []
+            now = time.time()
+            for key, sessions in self._idle.items():
+                keep = []
+                for smtp, last_used in sessions:
+                    if now - last_used > self.noop_interval:
+                        due.append((key, smtp))
+                    else:
+                        keep.append((smtp, last_used))
+                sessions[:] = keep
+
+        for key, smtp in due:
+            if self._alive(smtp):
+                self.release(key, smtp)
+            else:
+                self.discard(key, smtp)
+
+    def start_keepalive(self):
+        """Run keepalive() in a background thread every noop_interval seconds"""
+        if self._keepalive_thread and self._keepalive_thread.is_alive():
+            return
+
+        def run():
+            while True:
+                time.sleep(self.noop_interval)
+                self.keepalive()
+
+        self._keepalive_thread = threading.Thread(target=run, name="smtp-keepalive")
+        self._keepalive_thread.daemon = True
+        self._keepalive_thread.start()
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                "open": sum(self._open.values()),
+                "idle": sum(len(s) for s in self._idle.values()),
+                "connects": self.connects,
+                "reuses": self.reuses,
+            }
+
+    def _pop_idle(self, key):
+        """Return (session, idle seconds) for the most recently used idle session, closing expired ones.
+        Called with the lock held."""
+        sessions = self._idle.get(key)
+        now = time.time()
+        while sessions:
+            smtp, last_used = sessions.pop()
+            if now - last_used > self.idle_timeout:
+                self._close(smtp)
+                self._open[key] -= 1
+                continue
+            return smtp, now - last_used
+        return None, 0
+
+    def verify(self, server, port, sender, password):
+        """Log in on a fresh, unpooled session to check the credentials; raises on failure"""
+        smtp = self._connect((server, port, sender), password)
+        self._close(smtp, quit=True)
+
+    def _connect(self, key, password):
+        server, port, sender = key
+        with metrics.timer("smtp_connect_seconds", server=server):
+            smtp = smtplib.SMTP(server, port, timeout=self.timeout)
+            try:
+                if self.starttls:
+                    smtp.starttls()
+                smtp.login(sender, password)
+            except Exception:
+                self._close(smtp)
+                raise
+        self.connects += 1
+        logger.info(f"Opened SMTP session to {server}:{port}")
+        return smtp
+
+    @staticmethod
+    def _alive(smtp):
+        try:
+            return smtp.noop()[0] == 250
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(smtp, quit=False):
+        try:
+            if quit:
+                smtp.quit()
+            else:
+                smtp.close()
+        except Exception:
+            pass
+
+
+# Shared pool so every EmailSender talking to the same account reuses sessions
+default_pool = SMTPConnectionPool()
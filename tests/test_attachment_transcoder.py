@@ -0,0 +1,56 @@
+import os
+import time
+import wave
+import numpy as np
+from audio_handler import AttachmentTranscoder
+
+
+def write_clip(path, seed, seconds=10, sample_rate=16000):
+    samples = np.random.default_rng(seed).normal(0, 3000, seconds * sample_rate).astype("<i2")
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+    return path
+
+
+def cached_files(cache_dir):
+    return sorted(os.path.join(root, name) for root, _, names in os.walk(cache_dir)
+                  for name in names if name != "index.json")
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    clips = [write_clip(str(tmp_path / f"clip{i}.wav"), i) for i in range(4)]
+    transcoder = AttachmentTranscoder(cache_dir, format="wav", sample_rate=8000, max_entries=2)
+
+    first = transcoder.transcode(clips[0])
+    transcoder.transcode(clips[1])
+    assert transcoder.transcode(clips[0]) == first  # now the most recently used
+    transcoder.transcode(clips[2])
+
+    assert os.path.exists(first)
+    assert len(cached_files(cache_dir)) == 2
+    assert transcoder.get_stats()["cached_files"] == 2
+
+
+def test_cache_stays_under_max_bytes(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    transcoder = AttachmentTranscoder(cache_dir, format="wav", sample_rate=8000, max_bytes=400 * 1024)
+    for i in range(5):
+        transcoder.transcode(write_clip(str(tmp_path / f"clip{i}.wav"), i))
+
+    sizes = [os.path.getsize(path) for path in cached_files(cache_dir)]
+    assert len(sizes) == 2 and sum(sizes) <= 400 * 1024
+
+
+def test_expired_entries_are_dropped_on_load(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    clip = write_clip(str(tmp_path / "clip.wav"), 0)
+    AttachmentTranscoder(cache_dir, format="wav", sample_rate=8000).transcode(clip)
+    assert len(cached_files(cache_dir)) == 1
+
+    time.sleep(0.05)
+    AttachmentTranscoder(cache_dir, format="wav", sample_rate=8000, max_age=0.01)
+    assert cached_files(cache_dir) == []
@@ -0,0 +1,35 @@
+import os
+import time
+from audio_buffer import EvidenceRecorder
+from email_outbox import EmailOutbox
+from email_sender import EmailSender
+
+
+def make_sender():
+    return EmailSender("sender@example.com", "secret", smtp_server="localhost", smtp_port=2525,
+                       to_emails=["to@example.com"])
+
+
+def test_clips_queued_in_the_outbox_are_not_pruned(tmp_path):
+    outbox = EmailOutbox(make_sender(), str(tmp_path / "outbox.db"))
+    recorder = EvidenceRecorder(str(tmp_path / "evidence"), max_files=2, in_use=outbox.pending_attachments)
+    recorder.buffer.configure(16000, 2)
+    recorder.buffer.write(b"\x01\x00" * 16000 * 12)
+
+    queued = recorder.save(name="queued")
+    outbox.enqueue(attachment_path=queued)
+    others = []
+    for i in range(4):
+        time.sleep(0.01)
+        others.append(recorder.save(name=f"clip{i}"))
+
+    assert os.path.exists(queued)
+    assert [os.path.exists(path) for path in others] == [False, False, True, True]
+    outbox.close()
+
+
+def test_missing_attachment_is_dropped_at_delivery(tmp_path):
+    sender = make_sender()
+    message = sender._render_message("Subject", "Body", ["to@example.com"], [], False,
+                                     str(tmp_path / "pruned.wav"))
+    assert "Body" in message and "pruned.wav" not in message
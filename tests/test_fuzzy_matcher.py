@@ -0,0 +1,68 @@
+import random
+import pytest
+from fuzzy_matcher import FuzzyPhraseMatcher, tokenize
+
+LETTERS = "abcdefghijklmnoprstuvwy"
+
+
+def edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def brute_force(matcher, text):
+    """Best score per phrase over every window, scoring each phrase in full"""
+    words = tokenize(text)
+    best = {}
+    for size in matcher._candidate_window_sizes():
+        for start in range(max(1, len(words) - size + 1)):
+            window = "".join(words[start:start + size])
+            for phrase in matcher.phrases:
+                target = "".join(tokenize(phrase))
+                longest = max(len(window), len(target))
+                distance = edit_distance(window, target)
+                score = 1.0 - distance / longest
+                if distance <= matcher._spelling_bound(longest) and score >= matcher.min_score:
+                    best[phrase] = max(score, best.get(phrase, 0.0))
+    return {phrase: round(score, 6) for phrase, score in best.items()}
+
+
+def mutate(rng, text):
+    chars = list(text)
+    for _ in range(rng.randint(0, 3)):
+        i = rng.randrange(len(chars) + 1)
+        op = rng.random()
+        if op < 0.33 and chars:
+            chars.pop(min(i, len(chars) - 1))
+        elif op < 0.66:
+            chars.insert(i, rng.choice(LETTERS))
+        elif chars:
+            chars[min(i, len(chars) - 1)] = rng.choice(LETTERS)
+    return "".join(chars)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_filters_never_drop_a_match(seed):
+    rng = random.Random(seed)
+
+    def word():
+        return "".join(rng.choice(LETTERS) for _ in range(rng.randint(2, 7)))
+
+    phrases = sorted({" ".join(word() for _ in range(rng.randint(1, 3))) for _ in range(120)})
+    matcher = FuzzyPhraseMatcher(phrases, use_phonetic=False)
+    for _ in range(25):
+        text = " ".join(mutate(rng, rng.choice(phrases)) if rng.random() < 0.5 else word()
+                        for _ in range(rng.randint(1, 5)))
+        found = {match.phrase: round(match.score, 6) for match in matcher.find_all(text)}
+        assert found == brute_force(matcher, text), text
+
+
+def test_misspelled_trigger_is_found():
+    matcher = FuzzyPhraseMatcher(["send email", "call police"])
+    matches = matcher.find_all("please sand e-mail now")
+    assert [match.phrase for match in matches] == ["send email"]
@@ -0,0 +1,73 @@
+import random
+import threading
+import time
+import pytest
+from recognition_pipeline import RecognitionPipeline, SharedRecognitionPool
+
+
+def slow_recognize(clip):
+    time.sleep(random.uniform(0, 0.004))
+    return clip
+
+
+class Recorder:
+    """on_result that records results, the calling threads and any overlapping calls"""
+
+    def __init__(self):
+        self.results = []
+        self.threads = set()
+        self.active = 0
+        self.overlaps = 0
+
+    def __call__(self, result):
+        self.active += 1
+        if self.active > 1:
+            self.overlaps += 1
+        self.threads.add(threading.current_thread().name)
+        time.sleep(0.001)
+        self.results.append(result)
+        self.active -= 1
+
+
+def run(make_pipeline, clips=200):
+    random.seed(0)
+    recorder = Recorder()
+    pipeline = make_pipeline(recorder)
+    pipeline.start()
+    capture = threading.current_thread().name
+    accepted = [clip for clip in range(clips) if pipeline.submit(clip)]
+    deadline = time.time() + 5
+    while pipeline.get_stats()["processed"] + pipeline.get_stats()["dropped"] < clips and time.time() < deadline:
+        time.sleep(0.01)
+    pipeline.stop()
+    return recorder, pipeline.get_stats(), accepted, capture
+
+
+@pytest.mark.parametrize("policy", ["block", "drop_newest", "drop_oldest"])
+def test_results_are_serialized_in_order_off_the_capture_thread(policy):
+    recorder, stats, accepted, capture = run(
+        lambda on_result: RecognitionPipeline(slow_recognize, on_result, workers=4, queue_size=2,
+                                              drop_policy=policy))
+
+    assert recorder.results == sorted(recorder.results)
+    assert recorder.overlaps == 0
+    assert capture not in recorder.threads
+    assert stats["submitted"] == 200
+    assert stats["processed"] + stats["dropped"] == 200
+    assert len(recorder.results) == stats["processed"]
+    if policy == "block":
+        assert stats["dropped"] == 0 and recorder.results == accepted
+
+
+@pytest.mark.parametrize("policy", ["block", "drop_newest", "drop_oldest"])
+def test_pool_channels_deliver_the_same_way(policy):
+    pool = SharedRecognitionPool(workers=4)
+    recorder, stats, _, capture = run(
+        lambda on_result: pool.open_channel("mic", slow_recognize, on_result, queue_size=2, drop_policy=policy))
+    pool.stop()
+
+    assert recorder.results == sorted(recorder.results)
+    assert recorder.overlaps == 0
+    assert capture not in recorder.threads
+    assert stats["submitted"] == 200
+    assert stats["processed"] + stats["dropped"] == 200
@@ -0,0 +1,51 @@
+from email_sender import EmailSender
+
+
+class FakeServer:
+    def __init__(self):
+        self.sent = []
+
+    def sendmail(self, sender, recipients, message):
+        self.sent.extend(recipients)
+        return {}
+
+
+class FakePool:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.acquired = 0
+        self.server = FakeServer()
+
+    def acquire(self, key, password):
+        self.acquired += 1
+        if self.fail:
+            raise OSError("Connection refused")
+        return self.server
+
+    def release(self, key, server):
+        pass
+
+    def discard(self, key, server):
+        pass
+
+
+def make_sender(pool):
+    return EmailSender("sender@example.com", "secret", smtp_server="localhost", smtp_port=2525, pool=pool)
+
+
+def test_duplicate_recipients_are_sent_once():
+    pool = FakePool()
+    report = make_sender(pool).send_many(["a@example.com", {"email": "b@example.com"}, "A@example.com"])
+
+    assert pool.server.sent == ["a@example.com", "b@example.com"]
+    assert report["results"] == {"a@example.com": True, "b@example.com": True}
+    assert (report["sent"], report["failed"], report["duplicates"]) == (2, 0, 1)
+
+
+def test_connection_failure_fails_the_rest_of_the_batch():
+    pool = FakePool(fail=True)
+    report = make_sender(pool).send_many([f"user{i}@example.com" for i in range(5)])
+
+    assert pool.acquired == 1
+    assert report["failed"] == 5
+    assert set(report["results"].values()) == {"Connection refused"}
@@ -0,0 +1,95 @@
+import time
+import wave
+import numpy as np
+import pytest
+import speech_recognition as sr
+from audio_sources import FileSource
+from recognition_backends import CallableBackend
+from voice_listener import VoiceListener
+import events
+
+SAMPLE_RATE = 16000
+FRAME = 320  # 20 ms
+
+
+def write_bursts(path, bursts, tail=1.5):
+    """Write one tone per utterance (onset, duration, words) over faint noise"""
+    total = max(onset + duration for onset, duration, _ in bursts) + tail
+    samples = np.random.default_rng(0).normal(0, 30, int(total * SAMPLE_RATE))
+    for i, (onset, duration, _) in enumerate(bursts):
+        t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+        start = int(onset * SAMPLE_RATE)
+        samples[start:start + len(t)] += np.sin(2 * np.pi * (500 + 250 * i) * t) * 8000
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples.astype("<i2").tobytes())
+
+
+def stub_recognizer(bursts, heard_fraction):
+    """Transcribe the words of each utterance with at least heard_fraction of them inside the clip.
+
+    The utterance is told apart by its tone; a piece touching the start of the
+    clip is the end of the utterance, one touching the end is its beginning
+    (so utterances must be shorter than the window).
+    """
+    def recognize(audio):
+        samples = np.frombuffer(audio.frame_data, dtype="<i2").astype(np.float64)
+        frames = samples[:len(samples) // FRAME * FRAME].reshape(-1, FRAME)
+        loud = np.sqrt(np.mean(frames ** 2, axis=1)) > 2000
+        edges = np.diff(np.concatenate(([0], loud.astype(np.int8), [0])))
+        words = []
+        for start, end in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+            spectrum = np.abs(np.fft.rfft(frames[start:end].ravel()))
+            tone = np.argmax(spectrum) * SAMPLE_RATE / (2 * (len(spectrum) - 1))
+            _, duration, text = bursts[int(round((tone - 500) / 250))]
+            heard = (end - start) * FRAME / SAMPLE_RATE
+            if start == 0:
+                low, high = duration - heard, duration
+            else:
+                low, high = 0.0, heard if end == len(loud) else duration
+            spoken = text.split()
+            step = duration / len(spoken)
+            words += [word for k, word in enumerate(spoken)
+                      if min(high, (k + 1) * step) - max(low, k * step) >= step * heard_fraction]
+        if not words:
+            raise sr.UnknownValueError()
+        return " ".join(words)
+    return recognize
+
+
+def count_detections(tmp_path, bursts, window, hop, workers=0, heard_fraction=0.5):
+    path = str(tmp_path / "bursts.wav")
+    write_bursts(path, bursts)
+    listener = VoiceListener(trigger_phrases=["send email"], trigger_count=100,
+                             audio_source=FileSource(path), recognition_workers=workers,
+                             recognition_backend=CallableBackend("stub", stub_recognizer(bursts, heard_fraction)),
+                             streaming_config={"window": window, "hop": hop})
+    listener.recognizer.energy_threshold = 300
+    listener.start_listening(duration_mins=1)
+    deadline = time.time() + 30
+    while listener.is_running() and time.time() < deadline:
+        time.sleep(0.02)
+    listener.stop_listening()
+    detections, _ = listener.events.wait(0, timeout=0)
+    return sum(len(event.data["phrases"]) for event in detections if event.type == events.TRIGGER_DETECTED)
+
+
+@pytest.mark.parametrize("gap", [0.4, 0.6, 1.5])
+@pytest.mark.parametrize("heard_fraction", [0.25, 0.5, 0.9])
+@pytest.mark.parametrize("workers", [0, 2])
+def test_each_utterance_counts_once_with_small_hop(tmp_path, gap, heard_fraction, workers):
+    # hop < window / 2: every utterance is heard by several windows, some of them
+    # cutting it off part-way
+    bursts = [(1.0 + i * (1.0 + gap), 1.0, "send email") for i in range(6)]
+    assert count_detections(tmp_path, bursts, window=3.0, hop=0.5, workers=workers,
+                            heard_fraction=heard_fraction) == 6
+
+
+@pytest.mark.parametrize("window, hop", [(3.0, 0.5), (3.0, 1.5), (2.0, 1.0)])
+def test_repeats_within_an_utterance_all_count(tmp_path, window, hop):
+    bursts = [(1.0, 1.2, "send email send email"), (3.0, 0.8, "hello there"),
+              (4.4, 1.0, "please send email")]
+    assert count_detections(tmp_path, bursts, window, hop) == 3
+
@@ -0,0 +1,173 @@
+import threading
+import time
+
+# Built-in rule actions, run by VoiceListener when a rule fires
+ACTIONS = ("email", "play", "none")
+
+
+class TriggerRule:
+    """Fire an action when `count` detections of the rule's phrases fall within `window` seconds.
+
+    phrases=None matches every trigger phrase. Timestamps of the last `count`
+    detections are kept in a fixed-size ring buffer, so each detection is
+    recorded and checked in O(1) and the window slides exactly: the rule fires
+    as soon as the newest and the count-th newest detection are at most
+    `window` seconds apart. Firing clears the buffer and starts a cooldown
+    during which detections are ignored. action is one of ACTIONS or a
+    callable taking (rule, text).
+    """
+
+    def __init__(self, name, phrases=None, count=1, window=5.0, cooldown=0.0, action="email"):
+        if count < 1:
+            raise ValueError(f"Rule '{name}': count must be at least 1")
+        if window <= 0:
+            raise ValueError(f"Rule '{name}': window must be positive")
+        if not callable(action) and action not in ACTIONS:
+            raise ValueError(f"Rule '{name}': unsupported action {action!r}")
+
+        self.name = name
+        self.phrases = None if phrases is None else tuple(p.lower() for p in phrases)
+        self.count = int(count)
+        self.window = float(window)
+        self.cooldown = float(cooldown)
+        self.action = action
+
+        self._times = [0.0] * self.count
+        self._head = 0  # index of the oldest stored timestamp
+        self._size = 0
+        self._cooldown_until = float("-inf")
+        self.fired = 0
+        self.last_fired = None
+
+    def record(self, timestamp):
+        """Add a detection; returns True if the rule fires"""
+        if timestamp < self._cooldown_until:
+            return False
+
+        if self._size < self.count:
+            self._times[(self._head + self._size) % self.count] = timestamp
+            self._size += 1
+        else:
+            # Full: overwrite the oldest timestamp
+            self._times[self._head] = timestamp
+            self._head = (self._head + 1) % self.count
+
+        if self._size == self.count and timestamp - self._times[self._head] <= self.window:
+            self.reset()
+            self._cooldown_until = timestamp + self.cooldown
+            self.fired += 1
+            self.last_fired = timestamp
+            return True
+        return False
+
+    def pending(self, now=None):
+        """Number of recorded detections still inside the window"""
+        now = time.time() if now is None else now
+        return sum(1 for i in range(self._size)
+                   if now - self._times[(self._head + i) % self.count] <= self.window)
+
+    def reset(self):
+        self._head = 0
+        self._size = 0
+
+    def in_cooldown(self, now=None):
+        return (time.time() if now is None else now) < self._cooldown_until
+
+    def get_stats(self, now=None):
+        return {"pending": self.pending(now), "count": self.count, "window": self.window,
+                "fired": self.fired, "cooldown": self.in_cooldown(now)}
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a rule from a dict such as
+        {"name": "urgent", "phrases": ["help"], "count": 2, "window": 10, "cooldown": 60, "action": "email"}
+        """
+        return cls(config["name"], phrases=config.get("phrases"), count=config.get("count", 1),
+                   window=config.get("window", 5.0), cooldown=config.get("cooldown", 0.0),
+                   action=config.get("action", "email"))
+
+
+class RulesEngine:
+    """Evaluates many TriggerRules against phrase detections.
+
+    Rules are indexed by phrase, so a detection only touches the rules that
+    mention one of its phrases (plus the catch-all rules), and a transcript
+    counts at most once per rule however many of the rule's phrases it contains.
+    """
+
+    def __init__(self, rules=()):
+        self._lock = threading.Lock()
+        self._rules = {}
+        self._by_phrase = {}
+        self._catch_all = []
+        for rule in rules:
+            self.add_rule(rule)
+
+    @property
+    def rules(self):
+        return list(self._rules.values())
+
+    def get_rule(self, name):
+        return self._rules.get(name)
+
+    def phrases(self):
+        """Every phrase named by a rule (catch-all rules add none)"""
+        return list(self._by_phrase)
+
+    def add_rule(self, rule):
+        if isinstance(rule, dict):
+            rule = TriggerRule.from_config(rule)
+        with self._lock:
+            if rule.name in self._rules:
+                raise ValueError(f"Rule '{rule.name}' already exists")
+            self._rules[rule.name] = rule
+            self._index(rule)
+        return rule
+
+    def remove_rule(self, name):
+        with self._lock:
+            rule = self._rules.pop(name, None)
+            if rule is None:
+                return False
+            if rule.phrases is None:
+                self._catch_all.remove(rule)
+            else:
+                for phrase in rule.phrases:
+                    self._by_phrase[phrase].remove(rule)
+                    if not self._by_phrase[phrase]:
+                        del self._by_phrase[phrase]
+            return True
+
+    def _index(self, rule):
+        if rule.phrases is None:
+            self._catch_all.append(rule)
+            return
+        for phrase in dict.fromkeys(rule.phrases):
+            self._by_phrase.setdefault(phrase, []).append(rule)
+
+    def process(self, phrases, timestamp=None):
+        """Record a detection of `phrases` (one transcript); returns the rules that fired"""
+        timestamp = time.time() if timestamp is None else timestamp
+        fired = []
+        with self._lock:
+            seen = set()
+            candidates = list(self._catch_all)
+            for phrase in phrases:
+                candidates.extend(self._by_phrase.get(phrase.lower(), ()))
+            for rule in candidates:
+                if rule.name in seen:
+                    continue
+                seen.add(rule.name)
+                if rule.record(timestamp):
+                    fired.append(rule)
+        return fired
+
+    def reset(self):
+        with self._lock:
+            for rule in self._rules.values():
+                rule.reset()
+
+    def get_stats(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            return {name: rule.get_stats(now) for name, rule in self._rules.items()}
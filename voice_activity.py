@@ -0,0 +1,105 @@
+import threading
+import numpy as np
+
+
+class VoiceActivityDetector:
+    """Cheap NumPy voice-activity gate for captured clips.
+
+    Each clip is split into short frames and every frame is scored on RMS energy,
+    zero-crossing rate and spectral flatness. Clips with too few speech-like frames
+    are rejected so they never reach the (networked) speech recognizer.
+    """
+
+    def __init__(self, energy_threshold=None, min_zcr=0.01, max_zcr=0.35,
+                 max_flatness=0.5, min_speech_ratio=0.1, frame_ms=20):
+        # energy_threshold of None means "use the recognizer's calibrated threshold"
+        self.energy_threshold = energy_threshold
+        self.min_zcr = min_zcr
+        self.max_zcr = max_zcr
+        self.max_flatness = max_flatness
+        self.min_speech_ratio = min_speech_ratio
+        self.frame_ms = frame_ms
+
+        self._lock = threading.Lock()
+        self.clips_checked = 0
+        self.clips_gated = 0
+
+    def frame_features(self, samples, sample_rate):
+        """Return per-frame (energy, zcr, flatness) arrays for a mono int16 signal"""
+        frame_len = max(1, int(sample_rate * self.frame_ms / 1000))
+        n_frames = len(samples) // frame_len
+        if n_frames == 0:
+            empty = np.zeros(0)
+            return empty, empty, empty
+
+        frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len).astype(np.float32)
+
+        energy = np.sqrt(np.mean(frames ** 2, axis=1))
+
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame_len
+
+        # Spectral flatness: geometric mean over arithmetic mean of the power spectrum.
+        # Close to 1 for white noise, close to 0 for tonal/voiced frames.
+        power = np.abs(np.fft.rfft(frames * np.hanning(frame_len), axis=1)) ** 2 + 1e-10
+        flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+
+        return energy, zcr, flatness
+
+    def is_speech(self, audio, energy_threshold=None):
+        """Return True if an sr.AudioData clip looks like it contains speech"""
+        threshold = self.energy_threshold if self.energy_threshold is not None else energy_threshold
+        if threshold is None:
+            threshold = 300  # speech_recognition's default energy threshold
+
+        samples = np.frombuffer(audio.get_raw_data(convert_width=2), dtype=np.int16)
+        energy, zcr, flatness = self.frame_features(samples, audio.sample_rate)
+
+        if len(energy):
+            speech_frames = (
+                (energy >= threshold)
+                & (zcr >= self.min_zcr)
+                & (zcr <= self.max_zcr)
+                & (flatness <= self.max_flatness)
+            )
+            speech = np.count_nonzero(speech_frames) / len(energy) >= self.min_speech_ratio
+        else:
+            speech = False
+
+        with self._lock:
+            self.clips_checked += 1
+            if not speech:
+                self.clips_gated += 1
+        return speech
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "clips_checked": self.clips_checked,
+                "clips_gated": self.clips_gated,
+                "clips_passed": self.clips_checked - self.clips_gated,
+            }
+
+
+def active_segments(audio, energy_threshold=300, frame_ms=20, min_gap=0.2):
+    """Return [(start, end)] in seconds of the stretches of an sr.AudioData clip above
+    energy_threshold, joining stretches less than min_gap seconds apart (pauses
+    inside a word or phrase); empty if the whole clip is quieter than that"""
+    samples = np.frombuffer(audio.get_raw_data(convert_width=2), dtype=np.int16)
+    frame_len = max(1, int(audio.sample_rate * frame_ms / 1000))
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return []
+
+    frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len).astype(np.float32)
+    loud = np.sqrt(np.mean(frames ** 2, axis=1)) >= energy_threshold
+    edges = np.diff(np.concatenate(([0], loud.astype(np.int8), [0])))
+    frame_seconds = frame_len / float(audio.sample_rate)
+    segments = []
+    for start, end in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+        start, end = start * frame_seconds, end * frame_seconds
+        if segments and start - segments[-1][1] < min_gap:
+            segments[-1] = (segments[-1][0], end)
+        else:
+            segments.append((start, end))
+    return segments
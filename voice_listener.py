@@ -1,48 +1,175 @@
 import speech_recognition as sr
+import collections
 import os
 import time
 import threading
-import re
 import sys
 from email_sender import EmailSender
+from email_outbox import EmailOutbox
+from recognition_pipeline import RecognitionPipeline
+from voice_activity import VoiceActivityDetector, active_segments
+from audio_buffer import EvidenceRecorder, RecordingStream
+from noise_floor import CalibrationStore, NoiseFloorTracker, TrackedStream, device_key
+from phrase_matcher import PhraseMatcher
+from recognition_backends import GoogleBackend, RecognitionBackend, RecognitionService
+from fuzzy_matcher import FuzzyPhraseMatcher
+from trigger_rules import RulesEngine, TriggerRule
+from playback import PlaybackEngine, AUDIO_PLAYBACK_AVAILABLE
+import events
+from metrics import registry as metrics
 
-# Conditionally import audio playback libraries
-try:
-    import wave
-    import pyaudio
-    AUDIO_PLAYBACK_AVAILABLE = True
-except ImportError:
-    AUDIO_PLAYBACK_AVAILABLE = False
+if not AUDIO_PLAYBACK_AVAILABLE:
     print("Warning: Audio playback libraries not available")
 
+def _place(segments, fraction):
+    """Return (time, segment) for the point `fraction` of the way through the
+    voiced segments [(start, end, whole)]"""
+    remaining = fraction * sum(segment[1] - segment[0] for segment in segments)
+    for segment in segments:
+        if remaining <= segment[1] - segment[0]:
+            return segment[0] + remaining, segment
+        remaining -= segment[1] - segment[0]
+    return segments[-1][1], segments[-1]
+
+
+def _recognizable_segments(segments, length, reach, opens=False, closes=False, edge=0.05):
+    """Return [(start, end, whole)] for the voiced segments worth recognizing in a window.
+
+    segments are (start, end) seconds within a window of `length` seconds. A
+    segment cut off by the window's edges is dropped when another window hears
+    it whole, which is when less than `reach` seconds (window minus hop) of it
+    are visible. Longer ones are kept with whole=False. Edges where the window
+    opens or closes the stream don't cut anything.
+    """
+    kept = []
+    for start, end in segments:
+        whole = (start >= edge or opens) and (end <= length - edge or closes)
+        if whole or end - start >= reach:
+            kept.append((start, end, whole))
+    return kept
+
+
 class VoiceListener:
     def __init__(self, trigger_phrases=None, response_audio_path=None, trigger_count=3, 
-                 email_config=None, phrase_time_limit=5):
+                 email_config=None, phrase_time_limit=5, recognition_workers=0,
+                 recognition_queue_size=4, drop_policy="block", vad_config=None,
+                 fuzzy_config=None, outbox_path=None, playback_policy="cancel",
+                 audio_source=None, recognition_pool=None, name="listener", rules=None,
+                 recognition_backend=None, streaming_config=None, noise_config=None,
+                 evidence_config=None):
         self.recognizer = sr.Recognizer()
-        try:
-            self.microphone = sr.Microphone()
+        # Speech-to-text goes through a RecognitionService (deadline, rate limit,
+        # circuit breaker, optional hedged fallback); Google is the default engine
+        if recognition_backend is None:
+            recognition_backend = GoogleBackend(self.recognizer)
+        if isinstance(recognition_backend, RecognitionBackend):
+            recognition_backend = RecognitionService(recognition_backend)
+        self.recognition = recognition_backend
+        # audio_source replaces the microphone with a headless source from
+        # audio_sources (a file, a directory of recordings or a PCM pipe)
+        self.audio_source = audio_source
+        if audio_source is not None:
+            self.microphone = audio_source
             self.mic_available = True
-        except OSError:
-            print("Warning: Microphone not available")
-            self.microphone = None
-            self.mic_available = False
+        else:
+            try:
+                self.microphone = sr.Microphone()
+                self.mic_available = True
+            except (OSError, AttributeError):  # AttributeError when PyAudio is missing
+                print("Warning: Microphone not available")
+                self.microphone = None
+                self.mic_available = False
 
         self._running = False
         self._thread = None
         
         self.trigger_phrases = trigger_phrases or ["send email"]
-        self.trigger_patterns = [re.compile(r'\b' + re.escape(phrase.lower()) + r'\b') for phrase in self.trigger_phrases]
+
+        # Trigger rules: without explicit rules, one catch-all rule reproduces the
+        # classic "trigger_count detections within phrase_time_limit seconds -> email"
+        if rules is None:
+            rules = [TriggerRule("default", count=trigger_count, window=phrase_time_limit, action="email")]
+        self.rules = RulesEngine(rules)
+        # Phrases named by rules are listened for as well
+        for phrase in self.rules.phrases():
+            if phrase not in (p.lower() for p in self.trigger_phrases):
+                self.trigger_phrases = self.trigger_phrases + [phrase]
+        # The first rule drives the count shown in the UI
+        self.primary_rule = self.rules.rules[0] if self.rules.rules else None
+
+        self.phrase_matcher = PhraseMatcher(self.trigger_phrases)
+        # Optional fuzzy/phonetic matching for mis-transcribed phrases
+        self.fuzzy_matcher = FuzzyPhraseMatcher(self.trigger_phrases, **fuzzy_config) if fuzzy_config is not None else None
         self.response_audio_path = response_audio_path
+        self.playback_policy = playback_policy
+        self.player = None  # PlaybackEngine, opened when listening starts
+        self._player_lock = threading.Lock()
         
-        self.trigger_count = trigger_count
-        self.current_trigger_count = 0
+        self.trigger_count = self.primary_rule.count if self.primary_rule else trigger_count
+        self.current_trigger_count = 0  # detections of the primary rule inside its window
         self.phrase_time_limit = phrase_time_limit  # New parameter for phrase listen duration
+        self._trigger_lock = threading.Lock()
+
+        # Pipelined mode: capture keeps reading the microphone while a pool of
+        # workers runs recognition. 0 keeps the sequential listen/recognize loop.
+        self.recognition_workers = recognition_workers
+        self.recognition_queue_size = recognition_queue_size
+        self.drop_policy = drop_policy
+        self.pipeline = None
+        # A SharedRecognitionPool (e.g. from ListenerHost) takes precedence over
+        # a private pipeline; name identifies this listener's channel in it
+        self.recognition_pool = recognition_pool
+        self.name = name
+
+        # Continuous capture in fixed overlapping windows instead of listen() clips:
+        # {"window": seconds, "hop": seconds}. Utterances up to window - hop seconds
+        # long are always recognized whole by some window
+        self.streaming = None
+        if streaming_config is not None:
+            window = float(streaming_config.get("window", 3.0))
+            hop = float(streaming_config.get("hop", window / 2))
+            if not 0 < hop <= window:
+                raise ValueError("streaming hop must be positive and no longer than the window")
+            self.streaming = {"window": window, "hop": hop}
+        self._counted = []  # (phrase, time, segment, half length) of recent streaming matches
+
+        # Optional continuous noise-floor tracking with calibration saved per device:
+        # {"path": json file or None, "max_age": s, "save_interval": s, **NoiseFloorTracker options}
+        self.noise_tracker = None
+        self.calibration = None
+        self._noise_device = None
+        self._calibration_saved_at = 0
+        if noise_config is not None:
+            noise_config = dict(noise_config)
+            path = noise_config.pop("path", "data/calibration.json")
+            max_age = noise_config.pop("max_age", 7 * 24 * 3600)
+            self.calibration_save_interval = noise_config.pop("save_interval", 60)
+            self.calibration = CalibrationStore(path, max_age) if path else None
+            self.noise_tracker = NoiseFloorTracker(**noise_config)
+
+        # Optional ring buffer of recent audio; the stretch around a detection is
+        # attached to the email (EvidenceRecorder options, e.g. {"before": 8, "after": 2})
+        self.evidence = EvidenceRecorder(**evidence_config) if evidence_config is not None else None
+
+        # Optional voice-activity gate that drops noise-only clips before recognition
+        self.vad = VoiceActivityDetector(**vad_config) if vad_config is not None else None
         
         self.email_config = email_config
         self.email_sender = EmailSender(**email_config) if email_config else None
+
+        # With an outbox, emails are persisted and delivered off the listening thread
+        self.outbox = None
+        if self.email_sender and outbox_path:
+            self.outbox = EmailOutbox(self.email_sender, outbox_path, on_result=self._on_outbox_result)
+            if self.evidence and self.evidence.in_use is None:
+                # Clips still waiting in the outbox must outlive max_files pruning
+                self.evidence.in_use = self.outbox.pending_attachments
         
         # Flag to track if email was sent (for UI feedback)
         self.email_sent = False
+        
+        # Status events for the UI (detections, count changes, email results, stop)
+        self.events = events.EventChannel()
 
         if self.response_audio_path and not os.path.exists(self.response_audio_path):
             print(f"Warning: Response audio file '{self.response_audio_path}' not found.")
@@ -57,41 +184,116 @@ class VoiceListener:
             self.recognizer.adjust_for_ambient_noise(source, duration=1)
             print("Adjustment complete.")
 
-    def play_audio_response(self):
-        if not self.response_audio_path or not os.path.exists(self.response_audio_path):
+    def _calibrate(self):
+        """Set the starting energy threshold, skipping the blocking calibration when possible"""
+        live = isinstance(self.microphone, sr.Microphone)
+        if not self.noise_tracker:
+            if live:
+                # Recordings are not calibrated: the first second may already be speech
+                self.adjust_for_ambient_noise()
+            return
+
+        # The tracker follows the noise floor from here on, replacing dynamic adjustment
+        self.recognizer.dynamic_energy_threshold = False
+        self._noise_device = device_key(self.microphone) if self.calibration else None
+        floor = self.calibration.load(self._noise_device) if self._noise_device else None
+        if floor is not None:
+            self.noise_tracker.floor = floor
+            print(f"Using saved noise calibration for {self._noise_device} "
+                  f"(threshold {self.noise_tracker.threshold:.0f})")
+        elif live and self.noise_tracker.floor is None:
+            self.adjust_for_ambient_noise()
+            self.noise_tracker.floor = self.recognizer.energy_threshold / self.noise_tracker.ratio
+
+        if self.noise_tracker.threshold is not None:
+            self.recognizer.energy_threshold = self.noise_tracker.threshold
+        self._calibration_saved_at = time.time()
+
+    def _tap_stream(self, source):
+        """Route the entered source's reads through the noise-floor tracker and evidence buffer"""
+        if source.stream is None or isinstance(source.stream, (TrackedStream, RecordingStream)):
+            return
+        if self.noise_tracker:
+            source.stream = TrackedStream(source.stream, self.noise_tracker, source.SAMPLE_RATE,
+                                          source.SAMPLE_WIDTH, self.recognizer)
+        if self.evidence:
+            self.evidence.attach(source)
+
+    def _save_calibration(self, force=False):
+        if not self._noise_device or self.noise_tracker.floor is None:
+            return
+        now = time.time()
+        if not force and now - self._calibration_saved_at < self.calibration_save_interval:
+            return
+        self._calibration_saved_at = now
+        try:
+            self.calibration.save(self._noise_device, self.noise_tracker.floor, self.noise_tracker.threshold)
+        except OSError as e:
+            print(f"Error saving noise calibration: {e}")
+
+    def get_noise_stats(self):
+        return self.noise_tracker.get_stats() if self.noise_tracker else None
+
+    def _start_player(self):
+        if self.player or not self.response_audio_path or not os.path.exists(self.response_audio_path):
             return
             
         if not AUDIO_PLAYBACK_AVAILABLE:
             print("Cannot play audio: playback libraries not available")
             return
             
-        try:
-            wf = wave.open(self.response_audio_path, 'rb')
-            p = pyaudio.PyAudio()
-            stream = p.open(format=p.get_format_from_width(wf.getsampwidth()),
-                            channels=wf.getnchannels(),
-                            rate=wf.getframerate(),
-                            output=True)
-
-            chunk_size = 1024
-            data = wf.readframes(chunk_size)
-
-            while data and self._running:
-                stream.write(data)
-                data = wf.readframes(chunk_size)
-
-            stream.stop_stream()
-            stream.close()
-            p.terminate()
-            wf.close()
-
-            print("Response played.")
-        except Exception as e:
-            print(f"Error playing audio response: {e}")
+        with self._player_lock:
+            if self.player:
+                return
+            try:
+                # Decode the sound and open the output device once for the whole session
+                player = PlaybackEngine(self.response_audio_path, policy=self.playback_policy)
+                player.start()
+                self.player = player
+            except Exception as e:
+                print(f"Error preparing audio response: {e}")
+
+    def _stop_player(self):
+        # Runs on both the listening thread and the UI thread; only one may stop the stream
+        with self._player_lock:
+            player, self.player = self.player, None
+        if player:
+            player.stop()
+
+    def play_audio_response(self):
+        """Queue the response sound on the playback thread; never blocks capture"""
+        if not self.player:
+            self._start_player()
+        player = self.player
+        if player:
+            player.play()
+            print("Response queued for playback.")
 
     def check_for_trigger(self, text):
-        text = text.lower()
-        return any(pattern.search(text) for pattern in self.trigger_patterns)
+        """Return every trigger phrase found in text (an empty list if none matched)"""
+        matches = self.phrase_matcher.find_all(text)
+        if self.fuzzy_matcher:
+            for match in self.fuzzy_matcher.find_all(text):
+                if match.phrase not in matches:
+                    print(f"Fuzzy match: '{match.text}' ~ '{match.phrase}' (score {match.score:.2f})")
+                    matches.append(match.phrase)
+        return matches
+
+    def add_trigger_phrase(self, phrase):
+        if self.phrase_matcher.add_phrase(phrase):
+            if self.fuzzy_matcher:
+                self.fuzzy_matcher.add_phrase(phrase)
+            self.trigger_phrases = self.phrase_matcher.phrases
+            return True
+        return False
+
+    def remove_trigger_phrase(self, phrase):
+        if self.phrase_matcher.remove_phrase(phrase):
+            if self.fuzzy_matcher:
+                self.fuzzy_matcher.remove_phrase(phrase)
+            self.trigger_phrases = self.phrase_matcher.phrases
+            return True
+        return False
 
     def is_running(self):
         return self._running
@@ -99,112 +301,438 @@ class VoiceListener:
     def get_trigger_count(self):
         return self.current_trigger_count
 
+    def get_rule_stats(self):
+        return self.rules.get_stats()
+
+    def get_vad_stats(self):
+        return self.vad.get_stats() if self.vad else None
+
+    def get_recognition_stats(self):
+        return self.recognition.get_stats()
+
+    def recognize_audio(self, audio):
+        """Run speech recognition on a captured clip, returning None if nothing was understood"""
+        if self.vad:
+            with metrics.timer("voice_stage_seconds", stage="vad"):
+                speech = self.vad.is_speech(audio, self.recognizer.energy_threshold)
+            if not speech:
+                print("No speech detected in clip, skipping recognition")
+                metrics.inc("voice_recognition_total", result="gated")
+                return None
+
+        try:
+            with metrics.timer("voice_stage_seconds", stage="recognize"):
+                text = self.recognition.recognize(audio)
+            print(f"Heard: {text}")
+            metrics.inc("voice_recognition_total", result="ok")
+            return text
+        except sr.UnknownValueError:
+            print("Could not understand audio")
+            metrics.inc("voice_recognition_total", result="unknown_value")
+        except sr.RequestError as e:
+            print(f"Could not request results: {e}")
+            metrics.inc("voice_recognition_total", result="request_error")
+        return None
+
+    def handle_transcript(self, text, captured_at=None):
+        """Count a recognized transcript towards the trigger threshold.
+
+        captured_at is the evidence buffer time at which the clip ended.
+        """
+        with metrics.timer("voice_stage_seconds", stage="match"):
+            matches = self.check_for_trigger(text)
+        if matches:
+            self._handle_matches(matches, text, captured_at)
+
+    def _recognize_clip(self, item):
+        audio, captured_at = item
+        text = self.recognize_audio(audio)
+        return (text, captured_at) if text else None
+
+    def _handle_clip_result(self, result):
+        self.handle_transcript(*result)
+
+    def _handle_matches(self, matches, text, detected_at=None):
+        metrics.inc("voice_triggers_total")
+
+        print(f"Trigger phrase detected: {', '.join(matches)}")
+        self.events.publish(events.TRIGGER_DETECTED, phrases=matches, text=text)
+        with self._trigger_lock:
+            now = time.time()
+            fired = self.rules.process(matches, now)
+            if self.primary_rule in fired:
+                # Show the full count before resetting, as the UI expects
+                print(f"Trigger count: {self.primary_rule.count}/{self.trigger_count}")
+                self.events.publish(events.COUNT_CHANGED, count=self.primary_rule.count)
+                self.current_trigger_count = 0
+                self.events.publish(events.COUNT_CHANGED, count=0)
+            elif self.primary_rule:
+                self.current_trigger_count = self.primary_rule.pending(now)
+                print(f"Trigger count: {self.current_trigger_count}/{self.trigger_count}")
+                self.events.publish(events.COUNT_CHANGED, count=self.current_trigger_count)
+
+        if self.response_audio_path:
+            with metrics.timer("voice_stage_seconds", stage="playback"):
+                self.play_audio_response()
+
+        for rule in fired:
+            print(f"Rule '{rule.name}' fired: {rule.count} detection(s) within {rule.window:g}s")
+            self.events.publish(events.RULE_FIRED, rule=rule.name, text=text)
+            self._run_action(rule, text, detected_at)
+
+    def _run_action(self, rule, text, detected_at=None):
+        if callable(rule.action):
+            try:
+                rule.action(rule, text)
+            except Exception as e:
+                print(f"Error running action for rule '{rule.name}': {e}")
+        elif rule.action == "email":
+            print(f"Trigger threshold reached! Sending email immediately...")
+            self.send_email(attachment_path=self._save_evidence(rule, detected_at))
+        elif rule.action == "play":
+            self.play_audio_response()
+
+    def _expire_detection_window(self):
+        # Detections slide out of the primary rule's window over time; refresh
+        # the displayed count when that happens
+        if not self.primary_rule:
+            return
+        with self._trigger_lock:
+            pending = self.primary_rule.pending()
+            if pending < self.current_trigger_count:
+                print(f"Detection window of {self.primary_rule.window:g}s expired. Count {self.current_trigger_count} -> {pending}")
+                self.current_trigger_count = pending
+                self.events.publish(events.COUNT_CHANGED, count=pending)
+
     def listen_for_triggers(self, duration_mins=60):
         if not self.mic_available:
             print("Cannot listen: microphone not available")
             self._running = False
             return
             
-        self.adjust_for_ambient_noise()
+        self._calibrate()
         
         end_time = time.time() + duration_mins * 60  # Convert minutes to seconds
         self.current_trigger_count = 0  # Reset counter
+        self.rules.reset()
         self.email_sent = False  # Reset email sent flag
 
         print(f"Listening for trigger phrases: {', '.join(self.trigger_phrases)}")
         print(f"Listening for {duration_mins} minutes with {self.phrase_time_limit}s phrase time limit")
 
-        detection_period_start = time.time()  # Start time for the detection window
-        
+        # In streaming mode the pipeline carries windows and their stream times
+        recognize = self._recognize_window if self.streaming else self._recognize_clip
+        on_result = self._handle_window_result if self.streaming else self._handle_clip_result
+
+        if self.recognition_pool is not None:
+            self.pipeline = self.recognition_pool.open_channel(self.name, recognize, on_result,
+                                                               queue_size=self.recognition_queue_size,
+                                                               drop_policy=self.drop_policy)
+            self.pipeline.start()
+            print(f"Recognition pipeline shared as channel '{self.name}'")
+        elif self.recognition_workers > 0:
+            self.pipeline = RecognitionPipeline(
+                recognize,
+                on_result,
+                workers=self.recognition_workers,
+                queue_size=self.recognition_queue_size,
+                drop_policy=self.drop_policy
+            )
+            self.pipeline.start()
+            print(f"Recognition pipeline started with {self.recognition_workers} workers")
+
+        try:
+            if self.streaming:
+                self._stream_windows(end_time)
+            else:
+                self._listen_clips(end_time)
+        finally:
+            if self.pipeline:
+                self.pipeline.stop()
+            self._stop_player()
+            self._save_calibration(force=True)
+
+        print("Listening stopped.")
+        self._running = False
+        self.events.publish(events.STOPPED)
+
+    def _listen_clips(self, end_time):
+        """Capture one phrase at a time with listen() until stopped"""
         while self._running and time.time() < end_time:
             # Check if we need to reset the count (if the detection period has expired)
-            current_time = time.time()
-            seconds_in_period = current_time - detection_period_start
-            
-            # If more than the phrase time window has passed since first detection
-            # and we haven't reached the threshold, reset the counter
-            if self.current_trigger_count > 0 and seconds_in_period > self.phrase_time_limit:
-                print(f"Detection window of {self.phrase_time_limit}s expired. Resetting count from {self.current_trigger_count} to 0")
-                self.current_trigger_count = 0
-                detection_period_start = current_time  # Reset the period start time
-            
+            self._expire_detection_window()
+            self._save_calibration()
+
             with self.microphone as source:
+                self._tap_stream(source)
                 try:
                     print(f"Listening for speech...")
                     # Use a shorter phrase_time_limit for better responsiveness
-                    audio = self.recognizer.listen(source, phrase_time_limit=min(5, self.phrase_time_limit))
-                    print("Audio captured, processing...")
-
-                    try:
-                        text = self.recognizer.recognize_google(audio)
-                        print(f"Heard: {text}")
-
-                        if self.check_for_trigger(text):
-                            print("Trigger phrase detected!")
-                            
-                            # If this is the first detection in a new period, reset the start time
-                            if self.current_trigger_count == 0:
-                                detection_period_start = time.time()
-                                
-                            self.current_trigger_count += 1
-                            print(f"Trigger count: {self.current_trigger_count}/{self.trigger_count}")
-                            
-                            if self.response_audio_path:
-                                self.play_audio_response()
-                            
-                            # Check if we've reached the required count within the time window
-                            if self.current_trigger_count >= self.trigger_count:
-                                print(f"Trigger threshold reached! Sending email immediately...")
-                                self.send_email()
-                                self.current_trigger_count = 0  # Reset counter after sending
-                                detection_period_start = time.time()  # Reset detection window
-
-                    except sr.UnknownValueError:
-                        print("Could not understand audio")
-                    except sr.RequestError as e:
-                        print(f"Could not request results: {e}")
-
+                    with metrics.timer("voice_stage_seconds", stage="listen"):
+                        audio = self.recognizer.listen(source, phrase_time_limit=min(5, self.phrase_time_limit))
                 except Exception as e:
                     print(f"Error during listening: {e}")
                     # Continue immediately to next iteration
                     continue
 
-        print("Listening stopped.")
-        self._running = False
+            if getattr(source, "exhausted", False):
+                # End of a file or pipe: handle this last clip, then stop
+                print("Audio source exhausted")
+                self._running = False
+
+            if not audio.frame_data:
+                # Nothing left at the end of a file or pipe; don't spend a recognition request
+                continue
+
+            captured_at = self.evidence.position if self.evidence else None
+            if self.pipeline:
+                # Hand the clip to the workers and go straight back to the microphone
+                if not self.pipeline.submit((audio, captured_at)):
+                    print("Recognition queue full, clip dropped")
+                continue
+
+            print("Audio captured, processing...")
+            try:
+                text = self.recognize_audio(audio)
+                if text:
+                    self.handle_transcript(text, captured_at)
+            except Exception as e:
+                print(f"Error during listening: {e}")
+
+    def _stream_windows(self, end_time):
+        """Capture continuously and emit overlapping windows of the most recent audio.
+
+        Every `hop` seconds the last `window` seconds (whole reads, so windows
+        line up with the source's chunks) are handed to recognition together
+        with the stream time at which they start.
+        """
+        window, hop = self.streaming["window"], self.streaming["hop"]
+        self._counted = []
+        print(f"Streaming recognition: {window:g}s windows every {hop:g}s")
+
+        while self._running and time.time() < end_time:
+            with self.microphone as source:
+                self._tap_stream(source)
+                chunk_seconds = float(source.CHUNK) / source.SAMPLE_RATE
+                chunks = collections.deque(maxlen=max(1, int(round(window / chunk_seconds))))
+                hop_chunks = max(1, int(round(hop / chunk_seconds)))
+                base_time = getattr(source, "position", 0.0)  # per-file offset for directory sources
+                read = 0
+                since_emit = 0
+                ended = False
 
-    def send_email(self):
+                while self._running and time.time() < end_time:
+                    self._expire_detection_window()
+                    self._save_calibration()
+                    try:
+                        data = source.stream.read(source.CHUNK)
+                    except Exception as e:
+                        print(f"Error during listening: {e}")
+                        continue
+                    if not data:
+                        ended = True
+                        break
+                    chunks.append(data)
+                    read += 1
+                    since_emit += 1
+                    if since_emit >= hop_chunks:
+                        self._emit_window(source, chunks, base_time + (read - len(chunks)) * chunk_seconds,
+                                          opens=read == len(chunks))
+                        since_emit = 0
+
+                # End of a file or pipe: recognize the audio the last window left for
+                # later, including speech that runs up to the end of the input
+                if ended and chunks:
+                    self._emit_window(source, chunks, base_time + (read - len(chunks)) * chunk_seconds,
+                                      opens=read == len(chunks), closes=True)
+
+            if getattr(source, "exhausted", False):
+                print("Audio source exhausted")
+                self._running = False
+
+    def _emit_window(self, source, chunks, start, opens=False, closes=False):
+        """Recognize a window, or queue it for the workers; opens/closes mark a window
+        that starts at the beginning or ends at the end of the input"""
+        audio = sr.AudioData(b"".join(chunks), source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+        item = (audio, start, len(chunks[0]), self.evidence.position if self.evidence else None, opens, closes)
+        if self.pipeline:
+            if not self.pipeline.submit(item):
+                print("Recognition queue full, window dropped")
+            return
+        try:
+            result = self._recognize_window(item)
+            if result:
+                self._handle_window_result(result)
+        except Exception as e:
+            print(f"Error during listening: {e}")
+
+    def _recognize_window(self, item):
+        """Recognize the whole voiced segments of a window.
+
+        Speech cut off by the window's edges is trimmed away when a neighbouring
+        window hears it whole, so the transcript only covers complete utterances
+        and phrase positions in it map onto the segments that were recognized.
+        """
+        audio, start, chunk_bytes, captured_at, opens, closes = item
+        bytes_per_second = audio.sample_rate * audio.sample_width
+        length = len(audio.frame_data) / float(bytes_per_second)
+        segments = active_segments(audio, self.recognizer.energy_threshold) or [(0.0, length)]
+        segments = _recognizable_segments(segments, length, self.streaming["window"] - self.streaming["hop"],
+                                          opens, closes)
+        if not segments:
+            return None  # only the edges of utterances other windows hear whole
+
+        # Cut at whole reads, keeping a little of the surrounding silence so the
+        # first and last words are intact
+        first = int(max(0.0, segments[0][0] - 0.1) * bytes_per_second) // chunk_bytes * chunk_bytes
+        last = -(-int((segments[-1][1] + 0.1) * bytes_per_second) // chunk_bytes) * chunk_bytes
+        text = self.recognize_audio(sr.AudioData(audio.frame_data[first:last], audio.sample_rate,
+                                                 audio.sample_width))
+        if not text:
+            return None
+        segments = [(start + seg_start, start + seg_end, whole) for seg_start, seg_end, whole in segments]
+        # Offset from stream time to evidence buffer time
+        clock_offset = None if captured_at is None else captured_at - (start + length)
+        return text, start, segments, clock_offset
+
+    def _handle_window_result(self, result):
+        """Count the trigger occurrences in a window's transcript that no earlier window
+        counted.
+
+        Each occurrence is placed on one of the window's voiced segments by its
+        position in the transcript. It repeats an earlier match of the same phrase
+        that lies in this window on an overlapping segment: the same utterance
+        heard again. When either window heard that utterance cut off, the two
+        estimated times must also be less than half the phrase's length apart.
+        Each earlier match absorbs at most one occurrence per window, so a phrase
+        said twice in one utterance still counts twice.
+        """
+        text, window_start, segments, clock_offset = result
+        with metrics.timer("voice_stage_seconds", stage="match"):
+            located = self._locate_matches(text)
+
+        # Windows arrive in order, so matches on segments over before this window
+        # can't be heard again
+        self._counted = [match for match in self._counted if match[2][1] > window_start]
+        earlier = [match for match in self._counted if match[1] >= window_start]
+
+        for begin, end, phrase in sorted((begin, end, phrase) for phrase, begin, end in located):
+            t, segment = _place(segments, (begin + end) / 2)
+            spoken_from, spoken_to = _place(segments, begin)[0], _place(segments, end)[0]
+            half = (spoken_to - spoken_from) / 2
+            repeats = [match for match in earlier
+                       if match[0] == phrase and match[2][0] < segment[1] and match[2][1] > segment[0]
+                       and ((segment[2] and match[2][2]) or abs(match[1] - t) <= max(half, match[3]))]
+            if repeats:
+                earlier.remove(min(repeats, key=lambda match: abs(match[1] - t)))
+                continue
+            self._counted.append((phrase, t, segment, half))
+            detected_at = None if clock_offset is None else spoken_to + clock_offset
+            self._handle_matches([phrase], text, detected_at)
+
+    def _locate_matches(self, text):
+        """Return (phrase, begin, end) for every trigger occurrence in text, with begin
+        and end as fractions (0..1) of the transcript length"""
+        length = float(max(1, len(text)))
+        located = [(phrase, begin / length, end / length)
+                   for begin, end, phrase in self.phrase_matcher.finditer(text)]
+        if self.fuzzy_matcher:
+            exact = {phrase for phrase, _, _ in located}
+            lowered = text.lower()
+            for match in self.fuzzy_matcher.find_all(text):
+                if match.phrase in exact:
+                    continue
+                print(f"Fuzzy match: '{match.text}' ~ '{match.phrase}' (score {match.score:.2f})")
+                begin = lowered.find(match.text.lower())
+                if begin >= 0:
+                    located.append((match.phrase, begin / length, (begin + len(match.text)) / length))
+                else:
+                    # Not found verbatim (words were joined): assume the middle of the window
+                    located.append((match.phrase, 0.5, 0.5))
+        return located
+
+    def _save_evidence(self, rule, detected_at=None):
+        """Save the audio around a detection for the email; returns the WAV path or None"""
+        if not self.evidence:
+            return None
+        try:
+            path = self.evidence.save(detected_at, name=f"{self.name}-{rule.name}")
+        except (OSError, ValueError) as e:
+            print(f"Error saving evidence clip: {e}")
+            return None
+        if path:
+            print(f"Evidence clip saved: {path}")
+        return path
+
+    def _email_kwargs(self, attachment_path=None):
+        return {
+            "subject": self.email_config.get("subject", "Voice Triggered Email"),
+            "body": self.email_config.get("body", "This is an automated email."),
+            "to_emails": self.email_config.get("to_emails", []),
+            "cc_emails": self.email_config.get("cc_emails", []),
+            "html_content": self.email_config.get("html_content", False),
+            "attachment_path": attachment_path or self.email_config.get("attachment_path")
+        }
+
+    def _on_outbox_result(self, message_id, success):
+        if success:
+            print(f"Email {message_id} sent successfully!")
+            self.email_sent = True  # Set flag for UI feedback
+            self.events.publish(events.EMAIL_SENT, message_id=message_id)
+        else:
+            print(f"Failed to send email {message_id}.")
+            self.events.publish(events.EMAIL_FAILED, message_id=message_id)
+
+    def send_email(self, attachment_path=None):
+        """Send the configured email; attachment_path replaces the configured attachment"""
         if self.email_sender:
+            if self.outbox:
+                message_id = self.outbox.enqueue(**self._email_kwargs(attachment_path))
+                print(f"Email {message_id} queued for delivery.")
+                self.events.publish(events.EMAIL_QUEUED, message_id=message_id)
+                return
+
             try:
-                result = self.email_sender.send_email(
-                    self.email_config.get("subject", "Voice Triggered Email"),
-                    self.email_config.get("body", "This is an automated email."),
-                    self.email_config.get("to_emails", []),
-                    self.email_config.get("cc_emails", []),
-                    html_content=self.email_config.get("html_content", False),
-                    attachment_path=self.email_config.get("attachment_path")
-                )
+                result = self.email_sender.send_email(**self._email_kwargs(attachment_path))
                 if result:
                     print("Email sent successfully!")
                     self.email_sent = True  # Set flag for UI feedback
+                    self.events.publish(events.EMAIL_SENT)
                 else:
                     print("Failed to send email.")
+                    self.events.publish(events.EMAIL_FAILED)
             except Exception as e:
                 print(f"Error sending email: {e}")
+                self.events.publish(events.EMAIL_FAILED, error=str(e))
         else:
             print("Email sender not configured.")
 
+    def get_outbox_stats(self):
+        return self.outbox.get_stats() if self.outbox else None
+
     def start_listening(self, duration_mins=60):
         if self._running:
             return False
             
         self._running = True
+        if self.outbox:
+            self.outbox.start()
+        self._start_player()
         self._thread = threading.Thread(target=self.listen_for_triggers, args=(duration_mins,))
         self._thread.daemon = True
         self._thread.start()
         return True
 
-    def stop_listening(self):
+    def request_stop(self):
+        """Ask the capture thread to finish without waiting for it (see stop_listening)"""
         self._running = False
+
+    def stop_listening(self):
+        self.request_stop()
         if self._thread and self._thread.is_alive():
             self._thread.join(timeout=2)
+        self._stop_player()
+        if self.outbox:
+            # Anything not yet delivered stays on disk for the next session
+            self.outbox.stop()
         return True
\ No newline at end of file